@@ -1,39 +1,24 @@
 from typing import List, Tuple
 import pandas as pd
-from collections import Counter
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mtick
-import matplotlib.dates as mdates
 from datetime import timedelta
-from matplotlib.colors import LinearSegmentedColormap
 
 from model import HNJobPosting
+from postings import DATASET_PATH, ENUM_FIELDS
+from compensation import SALARY_LABELS
+from cube import CUBE_PATH, MonthlyCube, update_cube
+from query import PostingIndex
+import charts
+from charts import render, render_pool
+from artifact_cache import CACHE_PATH, ArtifactCache, write_csv
 
 
 
-def analyze_seniority_levels(data: pd.DataFrame, force_normalize=False):
-
-    def extract_seniority(seniority_str):
-        if isinstance(seniority_str, str):
-            return [level.strip() for level in seniority_str.strip('[]').replace("'", "").split(',')]
-        return []
-
-
-    # Apply the function to create a new column with lists of seniority levels
-    data['seniority_list'] = data['seniority_level'].apply(extract_seniority)
-    
-    
-    # Explode the dataframe so each seniority level gets its own row
-    df_exploded = data.explode('seniority_list')
-    # Remove "Unknown" from seniority levels
-    df_exploded = df_exploded[df_exploded['seniority_list'] != 'Unknown']
-    df_exploded = df_exploded[df_exploded['seniority_list'].notna()]
-
+def analyze_seniority_levels(cube: MonthlyCube, force_normalize=False):
+    # "Unknown" is left out of the seniority levels
     categories = ["Junior", "Mid-level", "Senior", "Lead", "Manager", "Executive"]
 
-    # Group by year and seniority level, then calculate proportions
-    seniority_counts = df_exploded.groupby(['year', 'seniority_list']).size().unstack(fill_value=0).reindex(columns=categories, fill_value=0)
-    seniority_proportions = seniority_counts.div(data.groupby('year').size(), axis=0)
+    # Each seniority level of a posting is counted, divided by the number of postings of the year
+    seniority_proportions = cube.shares('seniority_level', 'year', categories)
 
     # Convert index to datetime for proper sorting
     try:
@@ -59,21 +44,11 @@ def analyze_seniority_levels(data: pd.DataFrame, force_normalize=False):
     }
 
     # Plot cumulative (stacked) area graph
-    plt.figure(figsize=(12, 6))
-    ax = seniority_proportions.plot.area(stacked=True, figsize=(12, 6), color=[custom_colors[cat] for cat in seniority_proportions.columns])
     normalized = "_normalized" if force_normalize else ""
     normalized_title = " Normalized" if force_normalize else ""
-    
-    # Format y-axis to show percentages
-    ax.yaxis.set_major_formatter(mtick.PercentFormatter(xmax=1))
-
-    plt.title(f'Cumulative Seniority Level Trend (2011-2024){normalized_title}')
-    plt.xlabel('Date')
-    plt.ylabel('Percentage of Seniority Levels')
-    plt.legend(title='Type', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig(f"seniority_levels_trend{normalized}.png")
-    plt.close()
+    render(charts.area_chart, seniority_proportions, f"seniority_levels_trend{normalized}.png",
+           f'Cumulative Seniority Level Trend (2011-2024){normalized_title}', 'Date', 'Percentage of Seniority Levels',
+           [custom_colors[cat] for cat in seniority_proportions.columns], legend_title='Type')
 
 
     # Print the first few rows of trends to understand its structure
@@ -84,12 +59,9 @@ def analyze_seniority_levels(data: pd.DataFrame, force_normalize=False):
 
 
 
-def analyze_trends(monthly_data, column, categories, title, filename, force_normalize=False):
-    # Calculate percentages for each category
-    trends = monthly_data[column].apply(lambda x: x.value_counts(normalize=True, dropna=False))
-    
-    # Ensure all categories are present, fill missing with 0
-    trends = trends.unstack(fill_value=0).reindex(columns=categories, fill_value=0)
+def analyze_trends(cube, column, categories, title, filename, period='year_month', force_normalize=False):
+    # Share of the postings of each period in each category, all categories present (0 when missing)
+    trends = cube.shares(column, period, categories)
     
     # Convert index to datetime for proper sorting
     try:
@@ -142,21 +114,11 @@ def analyze_trends(monthly_data, column, categories, title, filename, force_norm
     }
     
     # Plot cumulative (stacked) area graph
-    plt.figure(figsize=(12, 6))
-    ax = trends.plot.area(stacked=True, figsize=(12, 6), color=[custom_colors[cat] for cat in trends.columns])
     normalized = "_normalized" if force_normalize else ""
     normalized_title = " Normalized" if force_normalize else ""
-
-    # Format y-axis to show percentages
-    ax.yaxis.set_major_formatter(mtick.PercentFormatter(xmax=1))
-    
-    plt.title(f'Cumulative {title} Trend (2011-2024){normalized_title}')
-    plt.xlabel('Date')
-    plt.ylabel('Percentage of Jobs Offers')
-    plt.legend(title='Type', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig(f"{filename}_cumulative_trend{normalized}.png")
-    plt.close()
+    render(charts.area_chart, trends, f"{filename}_cumulative_trend{normalized}.png",
+           f'Cumulative {title} Trend (2011-2024){normalized_title}', 'Date', 'Percentage of Jobs Offers',
+           [custom_colors[cat] for cat in trends.columns], legend_title='Type')
 
     print(f"{title} categories: {', '.join(categories)}")
 
@@ -167,42 +129,40 @@ def analyze_trends(monthly_data, column, categories, title, filename, force_norm
     if force_normalize:
         print("\nForced normalization was applied.")
 
-def analyze_remote_trends(monthly_data):
+def analyze_remote_trends(cube):
     categories = ['Remote', 'Hybrid', 'In Person', 'Unknown']
-    analyze_trends(monthly_data, 'remote', categories, 'Remote Work', 'remote_work')
-
-def analyze_compensation_trends(data):
-    # Calculate average compensation for each group
-    categories = ['$0-100k', '$100k-120k', '$120k-140k', '$140k-160k',
-        '$160k-180k', '$180k-200k', '$200k-220k', '$220k+']
-    data = data[data['year'] != 2011]
-    yearly_data = data.groupby("year")
+    analyze_trends(cube, 'remote', categories, 'Remote Work', 'remote_work')
+
+def analyze_compensation_trends(cube):
+    # Salary ranges of the average compensation for each year
+    categories = SALARY_LABELS
+    cube = cube.select(years=[year for year in cube.sizes('year').index if year != 2011])
     
-    analyze_trends(yearly_data, 'salary_category', categories, 'Salary Ranges', 'salary_ranges', force_normalize=False)
+    analyze_trends(cube, 'salary_category', categories, 'Salary Ranges', 'salary_ranges', period='year', force_normalize=False)
 
-def analyze_job_demand_offer_trends(monthly_data):
+def analyze_job_demand_offer_trends(cube):
     categories = ['job-demand', 'job-offer']
-    analyze_trends(monthly_data, 'comment_status', categories, 'Job Demand vs Offer', 'job_demand_offer')
+    analyze_trends(cube, 'comment_status', categories, 'Job Demand vs Offer', 'job_demand_offer')
 
-def analyze_visa_sponsoring(monthly_data):
-    visa_trend = monthly_data['visa_sponsoring'].mean()
+def analyze_visa_sponsoring(cube):
+    visa_trend = cube.means('visa_sponsoring', 'year_month')
     plot_trend(list(visa_trend.items()), 'Visa Sponsoring Trend (2011-2024)', 'Percentage of Jobs Offering Visa Sponsorship', 'line')
 
-def analyze_job_types(monthly_data):
+def analyze_job_types(cube):
     job_types = ['full-time', 'part-time', 'contract', 'intern']
-    analyze_trends(monthly_data, 'job_type', job_types, 'Job Types', 'job_types')
+    analyze_trends(cube, 'job_type_label', job_types, 'Job Types', 'job_types')
 
-def analyze_fundraising_round(data):
-    yearly_data = data.groupby("year")
+def analyze_fundraising_round(cube):
     fundraising_round = ['Bootstrapped', 'Pre-Seed', 'Seed', 'Series A', 'Series B', 'Series C']
-    analyze_trends(yearly_data, 'fundraising_round', fundraising_round, 'Fundraising Round', 'fundraising_round')
-    recent_data = data[data['year'] >= 2020]
+    analyze_trends(cube, 'fundraising_round', fundraising_round, 'Fundraising Round', 'fundraising_round', period='year')
+    recent_data = cube.select(years=[year for year in cube.sizes('year').index if year >= 2020])
     
     # Count total job offers
-    total_offers = len(recent_data)
+    total_offers = recent_data.sizes('year').sum()
 
     # Count job offers for each fundraising round
-    fundraising_counts = recent_data['fundraising_round'].value_counts()
+    categories = [member.value for member in ENUM_FIELDS['fundraising_round']]
+    fundraising_counts = recent_data.totals('fundraising_round').reindex(categories, fill_value=0)
 
     # Calculate percentages
     fundraising_percentages = (fundraising_counts / total_offers * 100).round(2)
@@ -214,153 +174,30 @@ def analyze_fundraising_round(data):
     for category, percentage in fundraising_percentages_sorted.items():
         print(f"{category}: {percentage}%")
 
-def analyze_compensation(monthly_data):
-    comp_min_trend = monthly_data['compensation_min'].apply(lambda x: x[x <= 1000].mean())
-    comp_max_trend = monthly_data['compensation_max'].apply(lambda x: x[x <= 1000].mean())
+def analyze_compensation(cube, period='year_month'):
+    # Amounts above MAX_COMPENSATION were left out of the cube means
+    comp_min_trend = cube.means('compensation_min', period)
+    comp_max_trend = cube.means('compensation_max', period)
     plot_trend(list(comp_min_trend.items()), 'Minimum Compensation Trend', 'Average Minimum Compensation (in thousands USD)','area ')
     plot_trend(list(comp_max_trend.items()), 'Maximum Compensation Trend', 'Average Maximum Compensation (in thousands USD)','area')
 
-def analyze_company_sizes(monthly_data):
+def analyze_company_sizes(cube):
     sizes = ['Small', 'Medium', 'Large', 'Unknown']
-    analyze_trends(monthly_data, 'company_size', sizes, 'Company Sizes', 'company_sizes')
-
-
-def normalize_tech(tech):
-        tech = tech.lower().strip()
-        replacements = {
-            'javascript': 'js', 'javascript (es6)': 'js', 'es6 javascript': 'js','vanilla javascript': 'js',
-            'javascript/es6': 'js', 'javascript es6': 'js','frontend javascript': 'js',
-
-            'typescript': 'ts', 'typescript 3.5': 'ts', 'typescript 3.6': 'ts', 'typescript 3.7': 'ts', 'typescript 3.8': 'ts',
-            'typescript2': 'ts',
-            
-            'react.js': 'react','reactjs': 'react','react native': 'react','react-native': 'react',
-            'react/redux': 'react','reactnative': 'react','react js': 'react','javascript/react': 'react',
-            'react.js/flux':'react','react.js/redux':'react','react/react-native':'react','js/react':'react',
-            'react/flux':'react','react 0.17':'react',
-
-            'angularjs': 'angular','angular.js': 'angular','angular 2': 'angular','angular js': 'angular',
-            'angular 2+': 'angular','angular2': 'angular','angular 1': 'angular','angular 8': 'angular',
-            'angular 6': 'angular','angular 7': 'angular','angular 9': 'angular','angular 10': 'angular',
-            'angular 4': 'angular','angular 5': 'angular','angular 1.x': 'angular','angular material': 'angular',
-            'angular 2.0': 'angular','angular 2.x': 'angular','angular 6+': 'angular','angular 7+': 'angular',
-            'angular 11': 'angular','angular 1.6': 'angular','angular 1.7': 'angular','angular 1.8': 'angular',
-
-            'vue.js': 'vue','vuejs': 'vue','vue js': 'vue','vuex': 'vue','vue 3': 'vue','vue 2': 'vue',
-            'vue3': 'vue','vue 1': 'vue','vue 0': 'vue','vue 1.x': 'vue','vue 2.x': 'vue',
-            'vue/js': 'vue','vue2': 'vue','vue.js 3': 'vue','vue.js 2': 'vue','vue.js 1': 'vue',
-            
-            'sveltekit':'svelte','svelte 3':'svelte','svelte 2':'svelte','svelte 1':'svelte','svelte':'svelte',
-            'svelte js':'svelte','svelte.js':'svelte','svelte.js 3':'svelte','svelte.js 2':'svelte','svelte.js 1':'svelte',
-            
-            'node.js': 'node','nodejs': 'node',
-
-            'postgresql': 'postgres', 'postgressql': 'postgres', 'postgres rds': 'postgres',
-            'postgres db': 'postgres', 'postgresdb': 'postgres', 'postgres/mysql': 'postgres',
-            'rds postgres': 'postgres', 'postgre': 'postgres', 'postgres sql': 'postgres',
-            'rds / postgresql': 'postgres', 'postgresql 9.4': 'postgres', 'postgresql 9.6': 'postgres',
-            'postgresql 10': 'postgres', 'postgresql 11': 'postgres', 'postgresql 12': 'postgres',
-            'postgresql 13': 'postgres', 'postgresql 14': 'postgres', 'postgresql 15': 'postgres',
-
-            'mongo': 'mongodb', 'mongo db': 'mongodb','mongodb atlas': 'mongodb',
-            'redis failover': 'redis', 'redis labs': 'redis',
-            'golang': 'go',
-            'ruby on rails': 'rails',
-
-            'docker compose': 'docker', 'docker swarm': 'docker', 'docker/ecs': 'docker', 'docker-compose': 'docker',
-            'docker/docker swarm': 'docker',
-
-            'kubernetes': 'kubernetes', 'kubernets': 'kubernetes',
-
-            'saltstack/terraform': 'terraform', 'terraform cdk': 'terraform', 'hashicorp stack (terraform': 'terraform',
-            'hashicorp terraform': 'terraform',
-
-            'jenkins ci': 'jenkins', 'ci/jenkins': 'jenkins', 'jenkins continuous integration': 'jenkins',
-            'circle ci': 'circleci', 'circleci/mocha': 'circleci', 'circle-ci': 'circleci',
-
-            'amazon web services': 'aws','aws lambda': 'aws','amazon aws': 'aws',
-            'aws services': 'aws','aws ec2': 'aws','aws ecs': 'aws','amazon web services (aws)': 'aws',
-            'aws cloud': 'aws','aws batch': 'aws','aws cloud services': 'aws','aws lambdas': 'aws',
-            'aws serverless': 'aws','cloud iaas (aws)': 'aws','aws sagemaker': 'aws','aws sqs': 'aws','aws-serverless': 'aws',
-            
-            'azure devops': 'azure', 'microsoft azure': 'azure', 'azure cloud services': 'azure',
-            'ms azure': 'azure', 'azure functions': 'azure','azuredevops': 'azure','azure devops': 'azure',
-            'windows azure': 'azure','microsoft azure iaas': 'azure','microsoft azure paas': 'azure',
-
-            'google cloud': 'gcp','google cloud platform': 'gcp','google cloud platform (gcp)': 'gcp',
-            'google cloud functions': 'gcp','google cloud services': 'gcp','google cloud ml': 'gcp',
-            'google cloud storage': 'gcp','google cloud/container engine': 'gcp',
-
-            'cloudformation': 'aws cloudformation',
-            'gitlab': 'gitlab ci',
-            'travis': 'travis ci',
-            'circle': 'circleci',
-
-            'elasticsearch': 'elastic search', 'elastic': 'elastic search', 'elastic stack': 'elastic search',
-
-            'algolia search': 'algolia',
-
-            'html5': 'html',
-            'css3': 'css', 
-            
-            'python3': 'python', 'python 3': 'python', 'python/django': 'python', 'python 3.6': 'python', 'python 2.7': 'python',
-            'ipython': 'python', 'serverless python': 'python', 'python 3.9': 'python', 'python 3.8': 'python', 'python 3.7': 'python',
-            'django/python': 'python',
-            
-            'tensorflow/caffe': 'tensorflow', 'tensorflow probability': 'tensorflow','tensorflow': 'tensorflow', 
-            'tensorflow.js': 'tensorflow','smile/tensorflow': 'tensorflow','tensorflow & keras': 'tensorflow', 
-            'tensorflow lite': 'tensorflow','tensorflow gpu': 'tensorflow','python/tensorflow': 'tensorflow',
-            'tensorflow ii': 'tensorflow',
-            
-            'pytorch lightning': 'pytorch','python/pytorch': 'pytorch','pytorch geometric': 'pytorch',
-            'torch/pytorch': 'pytorch'
-        }
-        return replacements.get(tech, tech)
-
-
-
-def analyze_top_tech_stack(data, normalize_func=normalize_tech):
-
-    yearly_data = data.groupby("year")
-
-    #filter out 2024 data
-    data_2024 = data[data['year'] == 2024]
-
-    # Count NA values and empty lists
-    na_count = sum(group['tech_stack'].isna().sum() for _, group in yearly_data)
-    empty_list_count = sum((group['tech_stack'] == '[]').sum() for _, group in yearly_data)
-
-    print(f"Number of NA values in tech_stack: {na_count}")
+    analyze_trends(cube, 'company_size', sizes, 'Company Sizes', 'company_sizes')
+
+
+def analyze_top_tech_stack(cube):
+    # Count empty lists (the postings that could not be parsed have an empty tech stack too)
+    empty_list_count = cube.totals('empty').sum()
+
     print(f"Number of empty lists in tech_stack: {empty_list_count}")
 
-    # Flatten and normalize all tech stacks
-    #all_techs = [normalize_tech(tech.strip()) 
-    #             for _, group in yearly_data
-    #             for techs in group['tech_stack'].dropna() 
-    #             for tech in techs.split(',') if tech.strip()]
-    
-    # Flatten and normalize tech stacks for 2024
-    all_techs_2024 = [normalize_func(tech.strip()) 
-                      for techs in data_2024['tech_stack'].dropna() 
-                      for tech in techs.split(',') if tech.strip()]
-
-    # Count occurrences and get top 20 technologies for 2024
-    tech_counts_2024 = Counter(all_techs_2024)
-    top_techs_2024 = [tech for tech, _ in tech_counts_2024.most_common(15)]
-
-    # Prepare data for cumulative graph
-    tech_trends = {tech: [] for tech in top_techs_2024}
-    dates = []
-
-    for date, group in yearly_data:
-        # dates.append(pd.to_datetime(date + '-01'))
-        dates.append(date)
-        techs = group['tech_stack'].dropna().str.split(',').explode().apply(normalize_func)
-        tech_counts = techs.value_counts()
-        group_size = len(group)  # Number of entries in the group
-        
-        for tech in top_techs_2024:
-            tech_trends[tech].append(tech_counts.get(tech, 0) / group_size)
+    # Get top 15 technologies for 2024
+    if 2024 not in cube.sizes('year').index:
+        print("No postings in 2024, top technologies skipped")
+        return
+    tech_counts_2024 = cube.counts('tech', 'year').loc[2024]
+    top_techs_2024 = tech_counts_2024[tech_counts_2024 > 0].sort_values(ascending=False, kind='stable').index[:15].tolist()
 
      #color for each technology
     custom_colors = {
@@ -393,46 +230,18 @@ def analyze_top_tech_stack(data, normalize_func=normalize_tech):
         'svelte': 'yellow',
     }
 
-    # Plot cumulative (stacked) area graph
-    plt.figure(figsize=(12, 6))
-    
-    # Convert tech_trends to a DataFrame for easier manipulation
-    df_trends = pd.DataFrame(tech_trends, index=dates)
-    
-    # Create the stacked area plot
-    ax = df_trends.plot.area(stacked=True, figsize=(12, 6), color=[custom_colors[cat] for cat in df_trends.columns])
-
-    # Format y-axis to show percentages
-    ax.yaxis.set_major_formatter(mtick.PercentFormatter(xmax=1))
+    # Share of the postings of each year mentioning the technologies
+    df_trends = cube.shares('tech', 'year', top_techs_2024)
     
-    plt.title('Cumulative 2024 Top 15 Technologies Trend')
-    plt.xlabel('Date')
-    plt.ylabel('Cumulative Percentage of Jobs Mentioning Technologies')
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig("2024_top_15_technologies_cumulative_trend.png")
-    plt.close()
+    # Plot cumulative (stacked) area graph
+    render(charts.area_chart, df_trends, "2024_top_15_technologies_cumulative_trend.png",
+           'Cumulative 2024 Top 15 Technologies Trend', 'Date', 'Cumulative Percentage of Jobs Mentioning Technologies',
+           [custom_colors[cat] for cat in df_trends.columns])
 
     print(f"2024 top 15 technologies: {', '.join(top_techs_2024)}")
 
 
-def analyze_tech_stack(data, tech_list, title, normalize_func=normalize_tech):
-
-    yearly_data = data.groupby("year")
-
-    # Prepare data for cumulative graph
-    tech_trends = {tech: [] for tech in tech_list}
-    dates = []
-
-    for date, group in yearly_data:
-        dates.append(date)
-        techs = group['tech_stack'].dropna().str.split(',').explode().apply(normalize_func)
-        tech_counts = techs.value_counts()
-        group_size = len(group)  # Number of entries in the group
-        
-        for tech in tech_list:
-            tech_trends[tech].append(tech_counts.get(tech, 0) / group_size)
-
+def analyze_tech_stack(cube, tech_list, title):
     # Custom colors for DevOps technologies
     custom_colors = {
         'kubernetes': '#9bddb1','terraform': '#aaf0d1','docker': '#bfef45',
@@ -445,65 +254,27 @@ def analyze_tech_stack(data, tech_list, title, normalize_func=normalize_tech):
         'react': '#167288', 'angular': 'red', 'vue': 'green', 'svelte': 'yellow'
     }
 
-    # Plot cumulative (stacked) area graph
-    plt.figure(figsize=(12, 6))
-    
-    # Convert tech_trends to a DataFrame for easier manipulation
-    df_trends = pd.DataFrame(tech_trends, index=dates)
+    # Share of the postings of each year mentioning the technologies
+    df_trends = cube.shares('tech', 'year', tech_list)
 
     # Plot cumulative (stacked) area graph
-    ax = df_trends.plot.area(stacked=True, figsize=(12, 6), color=[custom_colors.get(cat, '#333333') for cat in df_trends.columns])
-    ax.yaxis.set_major_formatter(mtick.PercentFormatter(xmax=1))
-    plt.title(f'Cumulative {title} Trend (2011-2024)')
-    plt.xlabel('Date')
-    plt.ylabel('Cumulative Percentage of Jobs Mentioning Technologies')
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig(f"{title}_cumulative_trend.png")
-    plt.close()
+    render(charts.area_chart, df_trends, f"{title}_cumulative_trend.png",
+           f'Cumulative {title} Trend (2011-2024)', 'Date', 'Cumulative Percentage of Jobs Mentioning Technologies',
+           [custom_colors.get(cat, '#333333') for cat in df_trends.columns])
 
     print(f"{title} technologies analyzed: {', '.join(tech_list)}")
 
     # Plot 100% stacked area graph
-    plt.figure(figsize=(12, 6))
     df_percentage = df_trends.div(df_trends.sum(axis=1), axis=0)
-    ax = df_percentage.plot.area(stacked=True, figsize=(12, 6), color=[custom_colors.get(cat, '#333333') for cat in df_percentage.columns])
-    ax.yaxis.set_major_formatter(mtick.PercentFormatter(xmax=1))
-    plt.title(f'Relative {title} Trend (100% Stacked)')
-    plt.xlabel('Date')
-    plt.ylabel('Relative Percentage of Jobs Mentioning Technologies')
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig(f"{title}_technologies_relative_trend.png")
-    plt.close()
-
+    render(charts.area_chart, df_percentage, f"{title}_technologies_relative_trend.png",
+           f'Relative {title} Trend (100% Stacked)', 'Date', 'Relative Percentage of Jobs Mentioning Technologies',
+           [custom_colors.get(cat, '#333333') for cat in df_percentage.columns])
 
-def analyze_tech_monthly_trends(data, tech_list, title, normalize_func=normalize_tech):
 
-    # Create a year-month column for easier grouping
-    data['year_month'] = data['year'].astype(str) + '-' + data['month'].astype(str).str.zfill(2)
-
-    # Sort by year-month
-    data = data.sort_values('year_month')
-    
-    # Group by year-month
-    monthly_data = data.groupby('year_month')
-    
-    # Prepare data for graph
-    tech_trends = {tech: [] for tech in tech_list}
-    dates = []
-
-    for date, group in monthly_data:
-        dates.append(pd.to_datetime(date + '-01'))
-        techs = group['tech_stack'].dropna().str.split(',').explode().apply(normalize_func)
-        tech_counts = techs.value_counts()
-        group_size = len(group)  # Number of entries in the group
-        
-        for tech in tech_list:
-            tech_trends[tech].append(tech_counts.get(tech, 0) / group_size)
-
-    # Convert tech_trends to a DataFrame for easier manipulation
-    df_trends = pd.DataFrame(tech_trends, index=dates)
+def analyze_tech_monthly_trends(cube, tech_list, title):
+    # Share of the postings of each month mentioning the technologies, the year-month periods sort chronologically
+    df_trends = cube.shares('tech', 'year_month', tech_list)
+    df_trends.index = pd.to_datetime(df_trends.index + '-01')
     
 
     # Custom colors for technologies
@@ -516,52 +287,19 @@ def analyze_tech_monthly_trends(data, tech_list, title, normalize_func=normalize
         'kubernetes': '#9bddb1','terraform': '#aaf0d1','docker': '#bfef45',
     }
 
-    # Plot line graph
-    plt.figure(figsize=(12, 6))
-    for tech in tech_list:
-        plt.plot(dates, df_trends[tech], label=tech, color=custom_colors.get(tech, '#333333'), linewidth=2)
-    
-    plt.title(title)
-    plt.xlabel('Date')
-    plt.ylabel('Percentage of Jobs Mentioning Technology')
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.gca().yaxis.set_major_formatter(mtick.PercentFormatter(1.0))
-    plt.tight_layout()
-
-    # Format x-axis to show dates nicely
-    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
-    plt.gca().xaxis.set_major_locator(mdates.YearLocator())
-    plt.gcf().autofmt_xdate()  # Rotation
-    
-    plt.tight_layout()
-    
     # Generate filename from title
     filename = title.lower().replace(' ', '_') + '_trend.png'
-    plt.savefig(filename)
-    plt.close()
 
-    print(f"Plot saved as {filename}")
+    # Plot line graph, with the x-axis formatted as dates
+    render(charts.lines_chart, df_trends, filename, title, 'Date', 'Percentage of Jobs Mentioning Technology',
+           [custom_colors.get(tech, '#333333') for tech in tech_list], date_axis=True)
 
+    print(f"Plot saved as {filename}")
 
-def analyze_tech_trends(data, tech_list, title, normalize_func=normalize_tech):
 
-    yearly_data = data.groupby("year")
-    
-    # Prepare data for graph
-    tech_trends = {tech: [] for tech in tech_list}
-    dates = []
-
-    for date, group in yearly_data:
-        dates.append(date)
-        techs = group['tech_stack'].dropna().str.split(',').explode().apply(normalize_func)
-        tech_counts = techs.value_counts()
-        group_size = len(group)  # Number of entries in the group
-        
-        for tech in tech_list:
-            tech_trends[tech].append(tech_counts.get(tech, 0) / group_size)
-
-    # Convert tech_trends to a DataFrame for easier manipulation
-    df_trends = pd.DataFrame(tech_trends, index=dates)
+def analyze_tech_trends(cube, tech_list, title):
+    # Share of the postings of each year mentioning the technologies
+    df_trends = cube.shares('tech', 'year', tech_list)
     
 
     # Custom colors for technologies
@@ -574,291 +312,257 @@ def analyze_tech_trends(data, tech_list, title, normalize_func=normalize_tech):
         'kubernetes': '#9bddb1','terraform': '#aaf0d1','docker': '#bfef45', 
     }
 
-    # Plot line graph
-    plt.figure(figsize=(12, 6))
-    for tech in tech_list:
-        plt.plot(dates, df_trends[tech], 'o-', label=tech, color=custom_colors.get(tech, '#333333'), markersize=4, linewidth=2)
-
-    plt.title(title)
-    plt.xlabel('Year')
-    plt.ylabel('Percentage of Jobs Mentioning Technology')
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.gca().yaxis.set_major_formatter(mtick.PercentFormatter(1.0))
-    plt.tight_layout()
-    
     # Generate filename from title
     filename = title.lower().replace(' ', '_') + '_trend.png'
-    plt.savefig(filename)
-    plt.close()
 
-    print(f"Plot saved as {filename}")
+    # Plot line graph
+    render(charts.lines_chart, df_trends, filename, title, 'Year', 'Percentage of Jobs Mentioning Technology',
+           [custom_colors.get(tech, '#333333') for tech in tech_list], markers=True)
 
-def analyze_all_tech_stack(csv_path: str = "HN_case_study_expanded.csv"):
-    # Read the CSV file
-    df = pd.read_csv(csv_path)
+    print(f"Plot saved as {filename}")
 
-    # Helper function to normalize tech names
-    def normalize_tech(tech):
-        return tech.lower().strip()
+def analyze_query_trend(index: PostingIndex, title: str, within: dict, **filters):
+    # Monthly share of the postings matching within that also match filters, e.g. within={'tech': 'rust',
+    # 'continent': 'Europe', 'visa': True, 'since': '2020'} and remote='Remote' (see query.py)
+    print(f"{title}: {index.share(within, **filters):.2%} of {index.count(**within)} postings")
+    trend = index.series('year_month', within, **filters).dropna()
+    plot_trend(list(trend.items()), title, 'Percentage of Jobs', 'line')
 
-    # Flatten and normalize all tech stacks
-    all_techs = [normalize_tech(tech)
-                 for techs in df['tech_stack'].dropna()
-                 for tech in techs.split(',') if tech.strip()]
 
-    # Count occurrences
-    tech_counts = Counter(all_techs)
+def analyze_all_tech_stack(dataset_path: str = DATASET_PATH, use_cache: bool = True, cube: MonthlyCube = None):
+    # All the comments of the dataset, tech names only lowercased (not normalized)
+    cube = cube if cube is not None else update_cube(dataset_path, CUBE_PATH)
+    tech_counts = cube.totals('tech_name')
 
-    # Create a DataFrame from the counter
-    tech_df = pd.DataFrame.from_dict(tech_counts, orient='index', columns=['count'])
+    # Create a DataFrame from the counts
+    tech_df = tech_counts.to_frame('count')
     tech_df.index.name = 'technology'
     tech_df = tech_df.sort_values(by='count', ascending=False)
 
-    # Save to CSV
-    tech_df.to_csv("all_technologies_count.csv")
-    print("All technologies and their counts have been saved to all_technologies_count.csv")
+    # Save to CSV, unless the same counts were already saved
+    cache = ArtifactCache(CACHE_PATH, force=not use_cache)
+    if write_csv(tech_df, "all_technologies_count.csv", cache):
+        print("All technologies and their counts have been saved to all_technologies_count.csv")
+    else:
+        print("all_technologies_count.csv is up to date")
 
 
-def temporal_analysis(csv_path: str = "HN_case_study_expanded.csv"):
-    # Read the CSV file
-    df = pd.read_csv(csv_path)
-        
-    # Create a year-month column for easier grouping
-    df['year_month'] = df['year'].astype(str) + '-' + df['month'].astype(str).str.zfill(2)
-    
-    # Sort by year-month
-    df = df.sort_values('year_month')
-
-
-    df["average_compensation"] = (df["compensation_min"] + df["compensation_max"]) / 2
-    # Define salary ranges
-    salary_ranges = [
-        (0, 100), (100, 120), (120, 140), (140, 160),
-        (160, 180), (180, 200), (200, 220), (220, float('inf'))
-    ]
-    range_labels = [
-        '$0-100k', '$100k-120k', '$120k-140k', '$140k-160k',
-        '$160k-180k', '$180k-200k', '$200k-220k', '$220k+'
-    ]
-
-    # Categorize salaries
-    def categorize_salary(avg_comp):
-        for i, (lower, upper) in enumerate(salary_ranges):
-            if lower <= avg_comp < upper:
-                return range_labels[i]
-        # return range_labels[-1]  # For salaries 220k+
-    df["salary_category"] = df["average_compensation"].apply(categorize_salary)
+# Analyses of the report, they can be selected by name in temporal_analysis
+ANALYSES = [
+    'job-demand-offer', 'countries', 'remote', 'job-types', 'seniority', 'fundraising', 'visa', 'salary-ranges',
+    'company-sizes', 'top-tech', 'postings', 'tech-groups', 'numbers', 'query',
+]
 
-    # Filter for job-offer comments only
-    df_job_offers = df[df['comment_status'] == 'job-offer']
-    # Remove entries for 2024-09 (not a complete month)
-    df_job_offers = df_job_offers[df_job_offers['year_month'] != '2024-09']
-    
-    # Group by year-month
-    monthly_data = df_job_offers.groupby('year_month')
-    # Filter out months with less than 10 entries
-    monthly_data = monthly_data.filter(lambda x: len(x) >= 10).groupby('year_month')
-
-    # Only usefull if the job-offer filtering is not done in the previous step:
-    analyze_job_demand_offer_trends(monthly_data)
-
-    #Analyze different aspects
-    analyze_top_countries(df_job_offers)
-    analyze_remote_trends(monthly_data)
-    analyze_job_types(monthly_data)  # Not very usefull, only fulltime
-    analyze_seniority_levels(df_job_offers)
-    analyze_fundraising_round(df_job_offers)
-    analyze_visa_sponsoring(monthly_data)
-    analyze_compensation_trends(df_job_offers)
-    analyze_company_sizes(monthly_data)
-    analyze_top_tech_stack(df_job_offers)
-    plot_trend(list(monthly_data.size().items()), 'Job Postings Trend (2011-2024)', 'Number of Job Postings', 'line')
+# Questions answered by the query analysis from the posting indexes (see query.py): {title: (within, filters)}
+QUERIES = {
+    'Remote Rust Jobs in Europe with Visa': (
+        {'status': 'job-offer', 'tech': 'rust', 'continent': 'Europe', 'visa': True, 'since': '2020'}, {'remote': 'Remote'}),
+}
 
+# Technologies compared by the tech-groups analysis: {name: (technologies, title, cumulative charts, yearly lines)}
+TECH_GROUPS = {
     # List of DevOps technologies to track
-    devops_techs = [
+    'devops': ([
         'docker', 'kubernetes', 'terraform', 'ansible', 'chef', 'puppet', 'jenkins',
         'circleci', 'gitlab ci', 'travis ci', 'aws cloudformation', 'vagrant',
         'hashicorp vault', 'consul', 'prometheus', 'grafana', 'helm'
-    ]
-    analyze_tech_stack(df_job_offers, devops_techs, "DevOps")
-
+    ], "DevOps", True, False),
     # Pytorch vs. Tensorflow analysis
-    ML_techs = ['pytorch', 'tensorflow']    
-    analyze_tech_trends(df_job_offers, ML_techs, "Machine Learning Frameworks")
-    #analyze_tech_monthly_trends(df_job_offers, ML_techs, "ML Frameworks")
-
+    'ml': (['pytorch', 'tensorflow'], "Machine Learning Frameworks", False, True),
     #Cloud providers analysis
-    Cloud_techs = ['aws', 'azure', 'gcp']
-    analyze_tech_stack(df_job_offers, Cloud_techs, "Cloud Providers")
-    analyze_tech_trends(df_job_offers, Cloud_techs, "Cloud Providers")
-
+    'cloud': (['aws', 'azure', 'gcp'], "Cloud Providers", True, True),
     # Frontend frameworks analysis
-    frontend_techs = ['react', 'angular', 'vue', 'svelte']
-    analyze_tech_stack(df_job_offers, frontend_techs, "Frontend Frameworks")
-    analyze_tech_trends(df_job_offers, frontend_techs, "Frontend Frameworks")
-
+    'frontend': (['react', 'angular', 'vue', 'svelte'], "Frontend Frameworks", True, True),
     # Database analysis
-    database_tech = ['postgres', 'mongodb', 'redis']
-    analyze_tech_trends(df_job_offers, database_tech, "Database")
-
+    'database': (['postgres', 'mongodb', 'redis'], "Database", False, True),
     #search analysis
-    search_tech = ['elastic search', 'algolia']
-    analyze_tech_trends(df_job_offers, search_tech, "Search")
-
+    'search': (['elastic search', 'algolia'], "Search", False, True),
     #DevOps tools battle
-    devops_tools = ['kubernetes', 'terraform', 'docker']
-    analyze_tech_trends(df_job_offers, devops_tools, "DevOps Tools")
+    'devops-tools': (['kubernetes', 'terraform', 'docker'], "DevOps Tools", False, True),
+}
+
 
-    # Calculate the number of job postings per year
-    numerical_analysis(df_job_offers)
+def temporal_analysis(dataset_path: str = DATASET_PATH, processes=None, use_cache: bool = True, cube: MonthlyCube = None,
+                      analyses: List[str] = None, months: List[str] = None, tech_groups: List[str] = None):
+    # analyses, tech_groups: names from ANALYSES and TECH_GROUPS (all by default), months: year-months to
+    # analyze ('2024-08', all by default)
+    for name in analyses or []:
+        if name not in ANALYSES:
+            raise ValueError(f"Unknown analysis {name}, expected one of {', '.join(ANALYSES)}")
+    for name in tech_groups or []:
+        if name not in TECH_GROUPS:
+            raise ValueError(f"Unknown tech group {name}, expected one of {', '.join(TECH_GROUPS)}")
+
+    def selected(name):
+        return analyses is None or name in analyses
+
+    # Monthly counts of the dataset, only the months that changed since the last run are aggregated again
+    cube = cube if cube is not None else update_cube(dataset_path, CUBE_PATH)
+    if months is not None:
+        cube = cube.select(months=months)
+
+    # Filter for job-offer comments only
+    job_offers = cube.select(status='job-offer')
+    # Remove entries for 2024-09 (not a complete month)
+    job_offers = job_offers.select(months=[month for month in job_offers.sizes('year_month').index if month != '2024-09'])
+    
+    # Filter out months with less than 10 entries
+    month_sizes = job_offers.sizes('year_month')
+    monthly_data = job_offers.select(months=month_sizes.index[month_sizes >= 10])
+
+    # The tables are computed first, the charts are rendered at the end of the block by a pool of processes.
+    # Outputs made from the same data as on the previous run (see artifact_cache.py) are not written again
+    cache = ArtifactCache(CACHE_PATH, force=not use_cache)
+    with render_pool(processes, cache):
+        # Only usefull if the job-offer filtering is not done in the previous step:
+        if selected('job-demand-offer'):
+            analyze_job_demand_offer_trends(monthly_data)
+
+        #Analyze different aspects
+        if selected('countries'):
+            analyze_top_countries(job_offers, cache=cache)
+        if selected('remote'):
+            analyze_remote_trends(monthly_data)
+        if selected('job-types'):
+            analyze_job_types(monthly_data)  # Not very usefull, only fulltime
+        if selected('seniority'):
+            analyze_seniority_levels(job_offers)
+        if selected('fundraising'):
+            analyze_fundraising_round(job_offers)
+        if selected('visa'):
+            analyze_visa_sponsoring(monthly_data)
+        if selected('salary-ranges'):
+            analyze_compensation_trends(job_offers)
+        if selected('company-sizes'):
+            analyze_company_sizes(monthly_data)
+        if selected('top-tech'):
+            analyze_top_tech_stack(job_offers)
+        if selected('postings'):
+            plot_trend(list(monthly_data.sizes('year_month').items()), 'Job Postings Trend (2011-2024)', 'Number of Job Postings', 'line')
+
+        if selected('tech-groups'):
+            for name in tech_groups or TECH_GROUPS:
+                techs, title, cumulative, yearly = TECH_GROUPS[name]
+                if cumulative:
+                    analyze_tech_stack(job_offers, techs, title)
+                if yearly:
+                    analyze_tech_trends(job_offers, techs, title)
+        #analyze_tech_monthly_trends(job_offers, TECH_GROUPS['ml'][0], "ML Frameworks")
+
+        # Calculate the number of job postings per year
+        if selected('numbers'):
+            numerical_analysis(job_offers)
+
+        # Ad-hoc questions are answered from the posting indexes, without a new analysis over the whole dataset
+        if selected('query'):
+            index = PostingIndex.from_dataset(dataset_path)
+            for title, (within, filters) in QUERIES.items():
+                if months is not None:
+                    within = {'since': months[0], 'until': months[-1], **within}
+                analyze_query_trend(index, title, within, **filters)
 
 
  
  
-def numerical_analysis(df_job_offers: pd.DataFrame):
-
-    job_postings_per_year = df_job_offers.groupby('year').size().reset_index(name='count')
+def numerical_analysis(job_offers: MonthlyCube):
+    # Every yearly figure is a sum of the monthly cells of the cube
+    job_postings_per_year = job_offers.sizes('year')
     print("Number of Job Postings per Year:")
-    for _, row in job_postings_per_year.iterrows():
-        print(f"{row['year']}: {row['count']}")
+    for year, count in job_postings_per_year.items():
+        print(f"{year}: {count}")
     
 
-    visa_proportion_per_year = df_job_offers[['visa_sponsoring', 'year']].groupby('year').mean()
-    mean_2011_2019 = visa_proportion_per_year.loc[2011:2019, 'visa_sponsoring'].mean()
-    mean_2021_2024 = visa_proportion_per_year.loc[2021:2024, 'visa_sponsoring'].mean()
+    visa_proportion_per_year = job_offers.means('visa_sponsoring', 'year')
+    mean_2011_2019 = visa_proportion_per_year.loc[2011:2019].mean()
+    mean_2021_2024 = visa_proportion_per_year.loc[2021:2024].mean()
     print(f"Mean visa proportion from 2011 to 2019: {mean_2011_2019}")
     print(f"Mean visa proportion from 2021 to 2024: {mean_2021_2024}")
 
-    remote_per_year = df_job_offers[['remote', 'year']].groupby('year').value_counts(normalize=True)
+    # Share of each remote category among the postings of the year that have one, largest first
+    remote_counts = job_offers.counts('remote', 'year')
+    remote_per_year = remote_counts.div(remote_counts.sum(axis=1), axis=0).rename_axis(columns='remote').stack()
+    remote_per_year = remote_per_year[remote_counts.stack() > 0].rename('proportion')
+    remote_per_year = remote_per_year.sort_values(ascending=False, kind='stable').sort_index(level='year', sort_remaining=False, kind='stable')
     print(remote_per_year)
-    remote_2023_2024 = remote_per_year.loc[2023:2024]
-    total_remote_2023_2024 = remote_2023_2024.sum()
-    remote_and_hybrid_2023_2024 = remote_2023_2024.xs('Remote', level="remote") + remote_2023_2024.xs('Hybrid', level="remote")
+    remote_2023_2024 = remote_counts.loc[2023:2024].div(remote_counts.loc[2023:2024].sum(axis=1), axis=0)
+    total_remote_2023_2024 = remote_2023_2024.sum(axis=1)
+    remote_and_hybrid_2023_2024 = remote_2023_2024.reindex(columns=['Remote', 'Hybrid'], fill_value=0).sum(axis=1)
     proportion_remote_2023_2024 = remote_and_hybrid_2023_2024.sum() / total_remote_2023_2024.sum()
     print(f"Proportion of remote jobs in 2023-2024: {proportion_remote_2023_2024}")
 
-    def extract_seniority(seniority_str):
-        if isinstance(seniority_str, str):
-            return [level.strip() for level in seniority_str.strip('[]').replace("'", "").split(',')]
-        return []
-
-    # Apply the function to create a new column with lists of seniority levels
-    df_job_offers['seniority_list'] = df_job_offers['seniority_level'].apply(extract_seniority)
-
-    # Explode the dataframe so each seniority level gets its own row
-    df_exploded = df_job_offers.explode('seniority_list')
-
-    # Group by year and seniority level, then calculate proportions
-    seniority_counts = df_exploded.groupby(['year', 'seniority_list']).size().unstack(fill_value=0)
-    seniority_proportions = seniority_counts.div(df_job_offers.groupby('year').size(), axis=0)
+    # Each seniority level of a posting is counted, then divided by the number of postings of the year
+    seniority_counts = job_offers.counts('seniority_level', 'year').rename_axis(columns='seniority_level')
+    seniority_proportions = seniority_counts.div(job_offers.sizes('year'), axis=0)
     
     print("Seniority Level Counts per Year:")
     print(seniority_counts)
     print("Seniority Level Proportions per Year:")
     print(seniority_proportions)
 
-    # Calculate average compensation
-    df_job_offers['average_compensation'] = (df_job_offers['compensation_min'] + df_job_offers['compensation_max']) / 2
-
-    # Filter out rows where average_compensation is NaN
-    df_job_offers_with_comp = df_job_offers.dropna(subset=['average_compensation'])
-    # Remove values above 1000
-    df_job_offers_with_comp = df_job_offers_with_comp[df_job_offers_with_comp['average_compensation'] <= 1000]
+    # Average compensation, the values above MAX_COMPENSATION were left out of the cube
+    compensation = job_offers.dimension('average_compensation')
 
     # Calculate and print the overall average compensation
-    overall_avg_comp = df_job_offers_with_comp['average_compensation'].mean()
+    overall_avg_comp = compensation['sum'].sum() / compensation['count'].sum()
     print(f"Overall average compensation: ${overall_avg_comp:.2f}")
 
     # Calculate and print the average compensation per year
-    yearly_avg_comp = df_job_offers_with_comp.groupby('year')['average_compensation'].mean()
+    yearly_avg_comp = job_offers.means('average_compensation', 'year').dropna()
     print("\nAverage compensation per year:")
     for year, avg_comp in yearly_avg_comp.items():
         print(f"{year}: ${avg_comp:.2f}")
 
-    fundraising_round_yearly = df_job_offers.groupby(['year', 'fundraising_round']).size().unstack(fill_value=0)
-    fundraising_round_yearly_proportions = fundraising_round_yearly.div(df_job_offers.groupby('year').size(), axis=0)
+    # Distribution of the salary ranges per year
+    salary_counts = job_offers.counts('salary_range', 'year').reindex(columns=SALARY_LABELS, fill_value=0)
+    salary_counts = salary_counts[salary_counts.sum(axis=1) > 0]
+    salary_histogram = salary_counts.div(salary_counts.sum(axis=1), axis=0)
+    print("\nSalary ranges per year:")
+    print(salary_histogram)
+
+    # Distribution of the salary ranges in the countries with the most salaries (GB is counted as UK)
+    country_salaries = job_offers.totals('country_salary_range')
+    if not country_salaries.empty:
+        country_salaries.index = country_salaries.index.str.split('|', n=1, expand=True).set_names(['country', 'salary_range'])
+        country_salaries = country_salaries.unstack(fill_value=0).reindex(columns=SALARY_LABELS, fill_value=0)
+        country_salaries = country_salaries.loc[country_salaries.sum(axis=1).nlargest(10).index]
+        print("\nSalary ranges per country:")
+        print(country_salaries.div(country_salaries.sum(axis=1), axis=0))
+
+    fundraising_round_yearly = job_offers.counts('fundraising_round', 'year').rename_axis(columns='fundraising_round')
+    fundraising_round_yearly_proportions = fundraising_round_yearly.div(job_offers.sizes('year'), axis=0)
     print(fundraising_round_yearly_proportions)
 
 
-def analyze_top_countries(df: pd.DataFrame):
-    def parse_countries(countries):
-        if isinstance(countries, str):
-            # Split by comma and strip whitespace
-            return [country.strip() for country in countries.split(',')]
-        elif isinstance(countries, list):
-            return countries
-        else:
-            return []  # Return empty list for unexpected types
-
-    def normalize_country_code(country):
-        # Normalize UK to GB
-        return 'UK' if country == 'GB' else country
-
-    # Flatten the countries list and normalize
-    all_countries = [
-        normalize_country_code(country)
-        for countries in df['countries'].dropna() 
-        for country in parse_countries(countries)
-    ]
-    
-    # Count occurrences
-    country_counts = Counter(all_countries)
+def analyze_top_countries(cube: MonthlyCube, cache: ArtifactCache = None):
+    # Count occurrences of each country (GB is counted as UK)
+    country_counts = cube.totals('countries')
     
     # Get the top 10 countries
-    top_10_countries = country_counts.most_common(10)
+    top_10_countries = country_counts.sort_values(ascending=False, kind='stable').head(10)
     
     # Create a DataFrame
-    top_countries_df = pd.DataFrame(top_10_countries, columns=['Country', 'Count'])
+    top_countries_df = pd.DataFrame({'Country': top_10_countries.index, 'Count': top_10_countries.to_numpy()})
     
     # Sort by count in descending order
     top_countries_df = top_countries_df.sort_values('Count', ascending=False)
     
-    # Save to CSV
-    top_countries_df.to_csv("top_10_countries.csv", index=False)
-    print("Top 10 countries have been saved to top_10_countries.csv")
+    # Save to CSV, unless the same table was already saved
+    if write_csv(top_countries_df, "top_10_countries.csv", cache, index=False):
+        print("Top 10 countries have been saved to top_10_countries.csv")
+    else:
+        print("top_10_countries.csv is up to date")
     
     # Create a bar plot
-    plt.figure(figsize=(12, 6))
-    plt.bar(top_countries_df['Country'], top_countries_df['Count'])
-    plt.title('Top 10 Countries in Job Postings (2011-2024)')
-    plt.xlabel('Country')
-    plt.ylabel('Number of Job Postings')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig("top_10_countries_plot.png")
-    plt.close()
+    render(charts.bar_chart, top_countries_df['Country'].tolist(), top_countries_df['Count'].tolist(), "top_10_countries_plot.png",
+           'Top 10 Countries in Job Postings (2011-2024)', 'Country', 'Number of Job Postings')
     print("Bar plot of top 10 countries has been saved to top_10_countries_plot.png")
 
 
 def plot_trend(data: List[Tuple[str, float]], title: str, ylabel: str, plot_type: str):
     dates = [pd.to_datetime(date + '-01') for date, _ in data]
     values = [value for _, value in data]
-    
-    plt.figure(figsize=(12, 6))
-    
-    # Create the filled area plot
-    #plt.fill_between(dates, values, alpha=0.7)  # alpha controls the transparency
-    
-    if plot_type == "area":
-        plt.fill_between(dates, values, alpha=0.7)  # alpha controls the transparency
-    elif plot_type == "line":
-        # Create a simple line plot with dots
-        plt.plot(dates, values, 'o-', color='purple', markersize=4, linewidth=1.5)
-    
-    plt.title(title)
-    plt.xlabel('Date')
-    plt.ylabel(ylabel)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-
-    # Format y-axis as percentage
-    plt.gca().yaxis.set_major_formatter(mtick.PercentFormatter(xmax=1.0))
-    
-    # Add a subtle line on top of the filled area for better visibility
-    plt.plot(dates, values, color='black', linewidth=0.5)
-    
-    plt.savefig(f"{title.lower().replace(' ', '_')}.png")
-    plt.close()
+
+    render(charts.trend_chart, dates, values, f"{title.lower().replace(' ', '_')}.png", title, ylabel, plot_type)
 
 
 def plot_trend_chartbar(data: List[Tuple[str, float]], title: str, ylabel: str):
@@ -866,29 +570,13 @@ def plot_trend_chartbar(data: List[Tuple[str, float]], title: str, ylabel: str):
     dates = [pd.to_datetime(date + '-01') for date, _ in data]
     values = [value for _, value in data]
     
-    plt.figure(figsize=(12, 6))
-    
     # Calculate the average time delta between dates
     time_deltas = [dates[i+1] - dates[i] for i in range(len(dates)-1)]
     avg_delta = sum(time_deltas, timedelta()) / len(time_deltas)
     width = avg_delta.days  # Width in days
 
     # Create the bar chart with calculated width
-    plt.bar(dates, values, width=width, align='center')
-    
-    plt.title(title)
-    plt.xlabel('Date')
-    plt.ylabel(ylabel)
-    plt.xticks(rotation=45)
-    
-    # Format x-axis to show dates nicely
-    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
-    plt.gca().xaxis.set_major_locator(mdates.AutoDateLocator())
-    
-    plt.tight_layout()
-    
-    plt.savefig(f"{title.lower().replace(' ', '_')}_bar.png")
-    plt.close()
+    render(charts.trend_bar_chart, dates, values, f"{title.lower().replace(' ', '_')}_bar.png", title, ylabel, width)
 
 
 if __name__ == "__main__":
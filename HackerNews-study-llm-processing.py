@@ -1,105 +1,311 @@
+import asyncio
+import heapq
 import json
 import time
 import requests
 import os
-import threading
 from datetime import datetime
+import httpx
 import pandas as pd
-from model import HNJobPosting
-import math
-
-
-URL = "https://api.withexxa.com"
-
-
-json_req = [
-        {"role": "system", "content": f"You are an helpful assistant, you will fill a json object from a Who's Hiring hackernews post. You will use the following json schema to answer: {HNJobPosting.model_json_schema()}"}
-      ]
+from exxa_client import RETRY_STATUSES, URL, ExxaClient, RequestStats
+from ledger import (
+    DONE, FAILED, LEDGER_PATH, SUBMITTED, canonical_fingerprints, duplicates, mark, mark_duplicates, mark_pending, open_ledger,
+    request_ids, summary, to_submit
+)
+from dedup import find_duplicates
+from prompt import SCHEMA_JSON, PromptStats, build_messages
+from postings import DATASET_PATH, ParseStats, parse_postings, write_postings
+from hacker_news_parsing.store import STORE_PATH, comment_keys, open_store, query_comments
+
+# orjson decodes the result lines several times faster when it is installed
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
 
 
 session = requests.Session()
-session.headers.update({"X-API-Key": os.environ["EXXA_API_KEY"], "Content-Type": "application/json"})
-
-
-def api_exxa_call(offer: str, id: int):
-    url = f"{URL}/v1/requests"
-    msg = json_req.copy()
-    msg.append({"role": "user", "content": "Parse the following post to json: "+offer})
-    payload = {
-        "metadata": {
-            "comment_id": str(id)
-        },
+session.headers.update({"X-API-Key": os.environ.get("EXXA_API_KEY", ""), "Content-Type": "application/json"})
+
+
+def build_request(messages, id: int, time=None, thread_id=None):
+    # The keys of the comment travel in the metadata and come back with the result,
+    # so the results can be joined to the store without parsing the prompt
+    metadata = {"comment_id": str(id)}
+    if time is not None:
+        metadata["time"] = str(time)
+    if thread_id is not None:
+        metadata["thread_id"] = str(thread_id)
+    return {
+        "metadata": metadata,
         "request_body": {
             "model": "llama-3.1-70b-instruct-fp16",
-            "messages": msg,
+            "messages": messages,
             "temperature": 0.1,
             "n": 1,
             "max_tokens": 10000,
-            "response_schema": json.dumps(HNJobPosting.model_json_schema())
+            "response_schema": SCHEMA_JSON
         }
     }
-    response = session.post(url, json=payload)
+
+
+def build_comment_request(comment, prompt_stats=None):
+    datetime_obj = datetime.fromtimestamp(int(comment["time"]))
+    messages = build_messages(comment["text"], prefix=f"Year: {datetime_obj.year}, Month: {datetime_obj.month}, Comment: ", stats=prompt_stats)
+    return build_request(messages, comment["id"], time=comment["time"], thread_id=comment.get("thread_id"))
+
+
+def api_exxa_call(offer: str, id: int):
+    response = session.post(f"{URL}/v1/requests", json=build_request(build_messages(offer), id))
     return response.json()
 
 
-def call_api_one_month(comments_jsonl_file, write_to_file=False):
-    total_time = 0
-    with open(comments_jsonl_file, "r") as file:
-        with open("exxa_api_response.jsonl", "w") as output_file:
-            for line in file:
-                comment = json.loads(line)
-                if "deleted" not in comment or not comment["deleted"]:
-                    if "text" not in comment:
+async def submit_comments(comments, concurrency=16, rate=10.0, output_path="exxa_api_response.jsonl", ledger_path=LEDGER_PATH, near_duplicates=False):
+    # A fixed pool of workers shares one client, so the submission is paced by the rate limiter
+    # rather than by how many threads we start.
+    # Comments already submitted or done according to the ledger are skipped, so a rerun only sends the rest.
+    ledger = open_ledger(ledger_path)
+    remaining_ids = set(to_submit(ledger, [comment["id"] for comment in comments]))
+    comments = [comment for comment in comments if comment["id"] in remaining_ids]
+
+    # Postings with the same content as an already submitted one reuse its extraction instead
+    known_hashes, known_simhashes = canonical_fingerprints(ledger)
+    fingerprints, duplicate_of = find_duplicates(comments, known_hashes, known_simhashes, near_duplicates)
+    mark_duplicates(ledger, [
+        (comment["id"], duplicate_of[str(comment["id"])], comment["time"], *format_fingerprint(fingerprints[str(comment["id"])]))
+        for comment in comments if str(comment["id"]) in duplicate_of
+    ])
+    comments = [comment for comment in comments if str(comment["id"]) not in duplicate_of]
+    print(f"Ledger: {summary(ledger)}, {len(duplicate_of)} duplicates skipped, {len(comments)} comments to submit")
+
+    stats = RequestStats("submit", total=len(comments))
+    prompt_stats = PromptStats()
+    pending = iter(comments)
+
+    async with ExxaClient(concurrency=concurrency, rate=rate) as client:
+        # Appended, the ledger is what tells which requests belong to which comment
+        with open(output_path, "a") as output_file:
+
+            async def worker():
+                for comment in pending:
+                    mark_pending(ledger, comment["id"], comment["time"], *format_fingerprint(fingerprints[str(comment["id"])]))
+                    try:
+                        response = await client.submit(build_comment_request(comment, prompt_stats), stats)
+                    except httpx.HTTPError as e:
+                        stats.failures += 1
+                        mark(ledger, comment["id"], FAILED, error=str(e))
+                        print(f"Submission failed for comment {comment['id']}: {e}")
+                        continue
+                    output_file.write(json.dumps(response)+"\n")
+                    output_file.flush()
+                    mark(ledger, comment["id"], SUBMITTED, request_id=response["id"])
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+    stats.report()
+    prompt_stats.report()
+    print(f"Ledger: {summary(ledger)}")
+    ledger.close()
+
+
+def format_fingerprint(fingerprint):
+    text_hash, text_simhash = fingerprint
+    return text_hash, format(text_simhash, "016x") if text_simhash is not None else None
+
+
+def start_process_store(store_path=STORE_PATH, months=None, concurrency=16, rate=10.0, near_duplicates=False):
+    # One bulk read of the top-level comments, deleted and empty comments are filtered out by the store
+    conn = open_store(store_path)
+    comments = query_comments(conn, months=months)
+    conn.close()
+
+    asyncio.run(submit_comments(comments, concurrency=concurrency, rate=rate, near_duplicates=near_duplicates))
+
+
+def is_finished(result):
+    # A request is finished once it has a final status, or a result body for responses without status
+    if "status" in result:
+        return result["status"] in ("completed", "failed", "cancelled")
+    return result.get("result_body") is not None
+
+
+async def collect_results(result_file="exxa_api_response_done.jsonl", ledger_path=LEDGER_PATH, concurrency=16, rate=10.0,
+                          min_interval=5.0, max_interval=300.0, max_poll_failures=5):
+    # Polls every submitted request of the ledger until it is finished, writing each result as soon as it arrives.
+    # Requests are polled from a schedule ordered by due time; a request that is not ready yet is polled again
+    # later, with its interval doubled each time (up to max_interval), so long queues don't waste the rate limit.
+    # A request whose poll is refused (a 4xx other than 429), or fails max_poll_failures times, is marked failed
+    # in the ledger so the next submission sends its comment again.
+    ledger = open_ledger(ledger_path)
+    pending = request_ids(ledger, SUBMITTED)
+    print(f"Collecting {len(pending)} results")
+
+    now = time.monotonic()
+    schedule = [(now, comment_id) for comment_id in pending]
+    heapq.heapify(schedule)
+    intervals = {comment_id: min_interval for comment_id in pending}
+    poll_failures = {}
+    stats = RequestStats("collect")
+    done = 0
+    in_flight = 0
+
+    async with ExxaClient(concurrency=concurrency, rate=rate) as client:
+        with open(result_file, "a") as output_file:
+
+            async def worker():
+                nonlocal done, in_flight
+                while schedule or in_flight:
+                    if not schedule:
+                        await asyncio.sleep(min_interval)
                         continue
-                    start_time = time.time()
-                    timestamp = comment["time"]
-                    datetime_obj = datetime.fromtimestamp(int(timestamp))
-                    year = datetime_obj.year
-                    month = datetime_obj.month
-                    response = api_exxa_call(f"Year: {year}, Month: {month}, Comment: {comment['text']}", comment["id"])
-                    end_time = time.time()
-                    total_time += end_time - start_time
-                    if write_to_file:
-                        output_file.write(json.dumps(response)+"\n")
-    print(f"Total time: {total_time} seconds")
-    return response
-
-def start_process_whole_directory(dir_path):
-    threads = []
-    for root, dirs, files in os.walk(dir_path):
-        for file in files:
-            if file.endswith(".jsonl"):
-                file_path = os.path.join(root, file)
-                thread = threading.Thread(target=call_api_one_month, args=(file_path,))
-                threads.append(thread)
-                thread.start()
-    
-    # Wait for all threads to complete
-    for thread in threads:
-        thread.join()
-
-
-def result_to_jsonl(result_file="exxa_api_response_done.jsonl"):
-    # Get all the raw result from the api in a jsonl file, for programmed request stored in exxa_api_response.jsonl
-    with open("exxa_api_response.jsonl", "r") as output_file:
-        with open(result_file, "w") as output_file_done:
-            for line in output_file:
-                result = json.loads(line)
-                id = result["id"]
-                result_done = session.get(f"https://api.dev.withexxa.com/v1/requests/{id}")
-                output_file_done.write(json.dumps(result_done.json())+"\n")
-
-
-def result_all_hackernews_to_jsonl(file_path="HN_case_study_response.jsonl"):
-    # Get all the raw result from the api in a jsonl file, for all the request done on this account
-    result = session.get("https://api.dev.withexxa.com/v1/requests", params={"full": "true"})
-    with open(file_path, "w") as output_file:
-        for line in result.iter_lines():
+                    due, comment_id = heapq.heappop(schedule)
+                    in_flight += 1
+                    try:
+                        await asyncio.sleep(max(0.0, due - time.monotonic()))
+                        try:
+                            result = await client.get_request(pending[comment_id], stats)
+                        except httpx.HTTPError as e:
+                            stats.failures += 1
+                            poll_failures[comment_id] = poll_failures.get(comment_id, 0) + 1
+                            permanent = isinstance(e, httpx.HTTPStatusError) and e.response.status_code not in RETRY_STATUSES
+                            if permanent or poll_failures[comment_id] >= max_poll_failures:
+                                print(f"Polling failed for comment {comment_id}, giving up: {e}")
+                                mark(ledger, comment_id, FAILED, error=repr(e))
+                                continue
+                            print(f"Polling failed for comment {comment_id}: {e}")
+                            result = {}
+                        if result and is_finished(result):
+                            output_file.write(json.dumps(result)+"\n")
+                            output_file.flush()
+                            mark(ledger, comment_id, FAILED if result.get("status") == "failed" else DONE)
+                            done += 1
+                        else:
+                            intervals[comment_id] = min(max_interval, intervals[comment_id] * 2)
+                            heapq.heappush(schedule, (time.monotonic() + intervals[comment_id], comment_id))
+                    finally:
+                        in_flight -= 1
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+    stats.report()
+    print(f"Collected {done} results, ledger: {summary(ledger)}")
+    ledger.close()
+
+
+def result_to_jsonl(result_file="exxa_api_response_done.jsonl", concurrency=16, rate=10.0):
+    # Get all the raw results from the api in a jsonl file, for the requests submitted according to the ledger.
+    # Returns once every submitted request is finished.
+    asyncio.run(collect_results(result_file, concurrency=concurrency, rate=rate))
+
+
+# Results of the requests, one row per comment, before the extracted content is validated
+RESPONSE_PATH = "HN_case_study_response.parquet"
+
+# Lines written between two checkpoints of result_all_hackernews_to_jsonl
+CHECKPOINT_EVERY = 10000
+
+
+def load_checkpoint(checkpoint_path):
+    # lines and bytes of the file written so far, start_lines and start_bytes where the current download began
+    # in the file (an incremental download is appended after the previous results), since of that download
+    checkpoint = {"lines": 0, "bytes": 0, "start_lines": 0, "start_bytes": 0, "since": None, "complete": False}
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path, "r") as f:
+            checkpoint.update(json.load(f))
+    return checkpoint
+
+
+def new_download(lines, size, since):
+    return {"lines": lines, "bytes": size, "start_lines": lines, "start_bytes": size, "since": since, "complete": False}
+
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    with open(checkpoint_path + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+
+def result_all_hackernews_to_jsonl(file_path="HN_case_study_response.jsonl", page_size=None, since=None, max_retries=5):
+    # Get all the raw result from the api in a jsonl file, for all the request done on this account.
+    # The response is streamed and each line is written as received (no decode/encode round trip), so memory
+    # stays constant whatever the size of the history. A checkpoint (lines and bytes written) is saved every
+    # CHECKPOINT_EVERY lines: after a dropped connection, or when a previous run was interrupted, the file is
+    # cut back to the checkpoint and the download resumes from there with the offset parameter.
+    # page_size downloads the history in pages of that many requests. since only asks for newer requests, which
+    # are appended after the results already in the file; the file is only rewritten by a full download.
+    checkpoint_path = file_path + ".checkpoint"
+    checkpoint = load_checkpoint(checkpoint_path)
+    if not os.path.exists(file_path):
+        checkpoint = new_download(0, 0, since)
+    elif since is None and (checkpoint["complete"] or checkpoint["since"] is not None):
+        # Full download of the whole history
+        checkpoint = new_download(0, 0, None)
+    elif since is not None and not os.path.exists(checkpoint_path):
+        # Results downloaded before checkpoints existed, kept as they are
+        with open(file_path, "rb") as f:
+            lines = sum(1 for line in f if line.strip())
+        checkpoint = new_download(lines, os.path.getsize(file_path), since)
+    elif since is not None and (checkpoint["complete"] or checkpoint["since"] != since):
+        # Incremental download, after the complete results (or instead of an interrupted download of other requests)
+        if checkpoint["complete"]:
+            checkpoint = new_download(checkpoint["lines"], checkpoint["bytes"], since)
+        else:
+            checkpoint = new_download(checkpoint["start_lines"], checkpoint["start_bytes"], since)
+
+    with open(file_path, "r+b" if os.path.exists(file_path) else "w+b") as output_file:
+        attempt = 0
+        while True:
+            output_file.seek(checkpoint["bytes"])
+            output_file.truncate()
+            lines = page_start = checkpoint["lines"]
+
+            params = {"full": "true"}
+            if since is not None:
+                params["since"] = since
+            if page_size is not None:
+                params["limit"] = page_size
+            # The offset counts the requests of this download, not the lines of the previous downloads
+            offset = lines - checkpoint["start_lines"]
+            if offset or page_size is not None:
+                params["offset"] = offset
+
             try:
-                result_json = json.loads(line)
-                output_file.write(json.dumps(result_json)+"\n")
-            except Exception as e:
-                print(e)
+                with session.get("https://api.dev.withexxa.com/v1/requests", params=params, stream=True, timeout=(10, 300)) as result:
+                    result.raise_for_status()
+                    line = None
+                    for line in result.iter_lines(chunk_size=1 << 16):
+                        if not line.strip():
+                            continue
+                        output_file.write(line + b"\n")
+                        lines += 1
+                        if lines % CHECKPOINT_EVERY == 0:
+                            output_file.flush()
+                            checkpoint = {**checkpoint, "lines": lines, "bytes": output_file.tell()}
+                            save_checkpoint(checkpoint_path, checkpoint)
+                    # Only the last line is decoded: a connection closed mid-line would otherwise go unnoticed
+                    if line:
+                        try:
+                            json.loads(line)
+                        except json.JSONDecodeError:
+                            raise requests.exceptions.ChunkedEncodingError("response ended in the middle of a line")
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                attempt += 1
+                if attempt > max_retries:
+                    raise
+                print(f"Download interrupted after {lines} lines ({e}), resuming from line {checkpoint['lines']}")
+                time.sleep(2 ** attempt)
+                continue
+
+            output_file.flush()
+            page_lines = lines - page_start
+            checkpoint = {**checkpoint, "lines": lines, "bytes": output_file.tell()}
+            attempt = 0
+            # Without pagination the whole history came in one response, otherwise a short page is the last one
+            if page_size is None or page_lines < page_size:
+                break
+            save_checkpoint(checkpoint_path, checkpoint)
+
+    checkpoint["complete"] = True
+    save_checkpoint(checkpoint_path, checkpoint)
+    print(f"{checkpoint['lines'] - checkpoint['start_lines']} requests written to {file_path} ({checkpoint['lines']} in total)")
 
 
 def token_count():
@@ -126,8 +332,8 @@ def extract_content(x):
         return {'extracted_content': None}
 
 def extract_date_from_request(x):
-    # try:
-    messages = x.get('messages')
+    # Only for results submitted before the time was sent in the metadata
+    messages = x.get('messages') or []
     for message in messages:
         if message.get('role') == 'user':
             content = message.get('content', '')
@@ -143,150 +349,147 @@ def extract_date_from_request(x):
             
             return {'year': year, 'month': month}
     return {'year': None, 'month': None}
-    # except:
-    #     return {'year': None, 'month': None}
-
-
-def hackernews_result_to_csv(file_path="HN_case_study_response.jsonl"):
-    # Read the JSON lines file
-    df = pd.read_json(file_path, lines=True)
-    
-    # Parse the JSON strings in 'result_body' and create a new DataFrame
-    result_bodies = df['result_body'].apply(extract_content)
-    print(result_bodies.head())
-    df_results = pd.json_normalize(result_bodies.tolist())
-    
-    # Extract date information
-    date_info = df['request_body'].apply(extract_date_from_request)
-    df_date = pd.json_normalize(date_info.tolist())
-    
-    # Concatenate the original DataFrame with the new results and date DataFrames
-    df = pd.concat([df, df_results, df_date], axis=1)
-    
-    # Check if each "extracted_content" is a valid dictionary
-    def is_valid_dict(content):
-        try:
-            # Parse the content if it's a string
-            if isinstance(content, str):
-                content = json.loads(content)
-            
-            # Check if it's a dictionary and has the required key
-            return isinstance(content, dict) and "comment_status" in content
-        except json.JSONDecodeError as e:
-            print(e)
-            return False
-        except Exception as e:
-            print(e)
-            return False
-
-    valid_dicts = df['extracted_content'].apply(is_valid_dict)
-    print(f"Valid dictionaries: {valid_dicts.sum()}")
-    print(f"Invalid dictionaries: {(~valid_dicts).sum()}")
-    print(df[~valid_dicts]["extracted_content"].head())
+
+
+def add_duplicate_rows(df, ledger_path=LEDGER_PATH):
+    # Comments skipped as duplicates get a copy of the result of the comment they duplicate,
+    # with their own comment_id and date
+    ledger = open_ledger(ledger_path)
+    duplicate_df = pd.DataFrame(duplicates(ledger), columns=['duplicate_id', 'duplicate_of', 'duplicate_time'])
+    ledger.close()
+    if duplicate_df.empty:
+        return df
+
+    duplicate_df['duplicate_of'] = duplicate_df['duplicate_of'].astype('int64')
+    copies = df.drop_duplicates('comment_id').merge(duplicate_df, left_on='comment_id', right_on='duplicate_of')
+    copies['metadata'] = [{'comment_id': comment_id, 'duplicate_of': duplicate_of} for comment_id, duplicate_of in zip(copies['duplicate_id'], copies['duplicate_of'].astype(str))]
+    copies['comment_id'] = copies['duplicate_id'].astype('int64')
+    copies['time'] = copies['duplicate_time'].astype('Int64')
+    # The thread of the duplicate is not in the ledger, join_store fills it
+    copies['thread_id'] = pd.NA
+    dates = [date_of(timestamp) for timestamp in copies['time']]
+    copies['year'] = [date.year if date else None for date in dates]
+    copies['month'] = [date.month if date else None for date in dates]
+    print(f"Reused results for {len(copies)} duplicate comments")
+
+    copies = copies.drop(columns=['duplicate_id', 'duplicate_of', 'duplicate_time'])
+    return pd.concat([df, copies], ignore_index=True)
+
+
+def date_of(timestamp):
+    return datetime.fromtimestamp(int(timestamp)) if not pd.isna(timestamp) else None
+
+
+def join_store(df, store_path=STORE_PATH):
+    # Fills the thread_id (and time) of the rows that did not get them in their metadata
+    # (duplicates and older results) with one lookup of the store by primary key
+    missing = df['thread_id'].isna() & df['comment_id'].notna()
+    if not missing.any():
+        return df
+    conn = open_store(store_path)
+    keys = pd.DataFrame(comment_keys(conn, df.loc[missing, 'comment_id'].tolist()), columns=['comment_id', 'thread_id', 'time'])
+    conn.close()
+    keys = keys.set_index('comment_id')
+    df.loc[missing, 'thread_id'] = df.loc[missing, 'comment_id'].map(keys['thread_id'])
+    df.loc[missing, 'time'] = df.loc[missing, 'time'].fillna(df.loc[missing, 'comment_id'].map(keys['time']))
+    df[['thread_id', 'time']] = df[['thread_id', 'time']].astype('Int64')
+    undated = df['year'].isna() & df['time'].notna()
+    dates = [date_of(timestamp) for timestamp in df.loc[undated, 'time']]
+    df.loc[undated, 'year'] = [date.year for date in dates]
+    df.loc[undated, 'month'] = [date.month for date in dates]
+    print(f"Joined {int(df.loc[missing, 'thread_id'].notna().sum())} of {int(missing.sum())} rows to the store")
+    return df
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_result_lines(file_path):
+    # Single pass over the jsonl file: each line is decoded once and only the columns used later are kept,
+    # instead of loading every column with pd.read_json and running one .apply per extracted field.
+    # The comment keys and date come from the request metadata, the prompt is only parsed for older results.
+    # The extracted content is kept as text: it is decoded once, by parse_postings in expand_extracted_content.
+    columns = {
+        "id": [], "status": [], "metadata": [], "comment_id": [], "thread_id": [], "time": [],
+        "extracted_content": [], "year": [], "month": []
+    }
+    with open(file_path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = loads(line)
+            metadata = result.get("metadata") or {}
+            content = extract_content(result.get("result_body") or {})["extracted_content"]
+            comment_time = to_int(metadata.get("time"))
+            if comment_time is not None:
+                date = datetime.fromtimestamp(comment_time)
+                year, month = date.year, date.month
+            else:
+                date = extract_date_from_request(result.get("request_body") or {})
+                year, month = to_int(date["year"]), to_int(date["month"])
+            columns["id"].append(result.get("id"))
+            columns["status"].append(result.get("status"))
+            columns["metadata"].append(metadata)
+            columns["comment_id"].append(to_int(metadata.get("comment_id")))
+            columns["thread_id"].append(to_int(metadata.get("thread_id")))
+            columns["time"].append(comment_time)
+            columns["extracted_content"].append(content)
+            columns["year"].append(year)
+            columns["month"].append(month)
+
+    df = pd.DataFrame(columns)
+    return df.astype({column: "Int64" for column in ("comment_id", "thread_id", "time", "year", "month")})
+
+
+def hackernews_result_to_dataset(file_path="HN_case_study_response.jsonl", output_path=RESPONSE_PATH):
+    df = parse_result_lines(file_path)
+
+    # Whether the extractions decode and validate is reported by expand_extracted_content
+    extracted = df['extracted_content'].notna()
+    print(f"Results with an extraction: {extracted.sum()}")
+    print(f"Results without extraction: {(~extracted).sum()}")
+    if not extracted.all():
+        print(df.loc[~extracted, ["id", "status"]].head())
+
+    df = add_duplicate_rows(df)
+    df = join_store(df)
 
     # Sort the DataFrame by year and month
-    df['year'] = pd.to_numeric(df['year'], errors='coerce')
-    df['month'] = pd.to_numeric(df['month'], errors='coerce')
-    df = df.sort_values(['year', 'month'])
+    df = df.sort_values(['year', 'month'], kind='stable')
     df = df.reset_index(drop=True)
 
-    
     print(df.head())
-    df.to_csv("HN_case_study_fullresponse.csv", index=False)
+    df['metadata'] = df['metadata'].map(json.dumps)
+    df.to_parquet(output_path, index=False)
 
 
-def extract_content(x):
-    try:
-        content = x["choices"][0]["message"]["content"]
-        # Ensure the content starts with a JSON-like structure
-        if not content.strip().startswith('{"'):
-            if not content.strip().startswith('"'):
-                content = '{"' + content
-            else:
-                content = '{' + content
-        return {'extracted_content': content}
-    except:
-        return {'extracted_content': None}
-
-def extract_date_from_request(x):
-    # try:
-    messages = x.get('messages')
-    for message in messages:
-        if message.get('role') == 'user':
-            content = message.get('content', '')
-            # if content.startswith('Parse the following post to json:'):
-            # Extract year and month using string manipulation
-            year_start = content.find('Year: ') + 6
-            year_end = content.find(',', year_start)
-            month_start = content.find('Month: ') + 7
-            month_end = content.find(',', month_start)
-            
-            year = content[year_start:year_end].strip()
-            month = content[month_start:month_end].strip()
-            
-            return {'year': year, 'month': month}
-    return {'year': None, 'month': None}
-    # except:
-    #     return {'year': None, 'month': None}
+def expand_extracted_content(response_path=RESPONSE_PATH, output_path=DATASET_PATH):
+    df = pd.read_parquet(response_path)
 
+    # Parse extracted_content in one validated batch and create new columns
+    stats = ParseStats()
+    parsed_data = parse_postings(df['extracted_content'], stats)
+    stats.report()
+    expanded_df = pd.concat([df[['year', 'month', 'comment_id', 'thread_id', 'time', 'metadata']], parsed_data], axis=1)
 
-def parse_hn_job_posting(content: str) -> pd.Series:
-    try:
-        data = json.loads(content)
-        return pd.Series({
-            'comment_status': data.get('comment_status'),
-            'remote': data.get('remote'),
-            'visa_sponsoring': data.get('visa_sponsoring'),
-            'states': ','.join(data.get('states', [])),
-            'countries': ','.join(data.get('countries', [])),
-            'continents': ','.join(data.get('continents', [])),
-            'cities': ','.join(data.get('cities', [])),
-            'tech_stack': ','.join(data.get('tech_stack', [])),
-            'job_title': ','.join(data.get('job_title', [])),
-            'job_type': ','.join(data.get('job_type', [])),
-            'seniority_level': ','.join(data.get('seniority_level', [])),
-            'compensation_min': data.get('compensation_min'),
-            'compensation_max': data.get('compensation_max'),
-            'perks': ','.join(data.get('perks', [])),
-            'hiring_company': data.get('hiring_company'),
-            'company_size': data.get('company_size'),
-            'fundraising_round': data.get('fundraising_round'),
-            'fundraising_amount': data.get('fundraising_amount')
-        })
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {e}")
-        return pd.Series()
-    except TypeError as e:
-        if isinstance(content, float) and math.isnan(content):
-            return pd.Series()
-        print(f"Type error: {e}")
-        print(f"Content: {content}")
-        print(f"Type: {type(content)}")
-        return pd.Series()
-
-
-def expand_extracted_content():
-    df = pd.read_csv("HN_case_study_response.csv")
-    
-    # Parse extracted_content and create new columns
-    parsed_data = df['extracted_content'].apply(parse_hn_job_posting)
-    expanded_df = pd.concat([df[['year', 'month', 'metadata']], parsed_data], axis=1)
-    
-    # Save the expanded DataFrame
-    expanded_df.to_csv("HN_case_study_expanded.csv", index=False)
-    print("Expanded data saved to HN_case_study_expanded.csv")
+    # Save the typed dataset read by the analysis
+    write_postings(expanded_df, output_path)
+    print(f"Expanded data saved to {output_path}")
     print(f"Columns in expanded_df: {expanded_df.columns.tolist()}")
 
 
 if __name__ == "__main__":
     # Call llm api for all the comments
-    start_process_whole_directory("output")
-
-    # Call the next function only once the API is done processing the requests
-
-    # Get all the raw result from the api in a jsonl file
-    result_all_hackernews_to_jsonl()
-    # Parse the jsonl file to a csv
-    hackernews_result_to_csv()
-    # Reformat the csv to have content reformated in columns, and unused columns removed
+    start_process_store()
+
+    # Get the raw results from the api in a jsonl file, waits until the API has processed every request
+    # (result_all_hackernews_to_jsonl() gets every request ever done on the account instead)
+    result_to_jsonl()
+    # Parse the jsonl file to a parquet file
+    hackernews_result_to_dataset("exxa_api_response_done.jsonl")
+    # Validate the extracted content and write it as typed columns, unused columns removed
     expand_extracted_content()
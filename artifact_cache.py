@@ -0,0 +1,80 @@
+# Cache of the report outputs (charts and csv files), keyed by a hash of what they are made from
+# Each output is recorded in a manifest with the hash of its input table, parameters and of the code that
+# draws or writes it. On the next run an output whose hash did not change, and whose file is still there,
+# is not written again: only the charts whose data changed are rendered.
+
+import hashlib
+import inspect
+import json
+import os
+
+import pandas as pd
+
+CACHE_PATH = ".report_cache.json"
+
+
+def update_hash(digest, value):
+    # Content hash of tables, lists, dicts and plain values (repr), the same value always gives the same hash
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(type(value).__name__.encode())
+        digest.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+        digest.update(repr([str(dtype) for dtype in (value.dtypes if isinstance(value, pd.DataFrame) else [value.dtype])]).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            update_hash(digest, item)
+    elif isinstance(value, dict):
+        digest.update(f"dict{len(value)}".encode())
+        for key in sorted(value, key=repr):
+            update_hash(digest, key)
+            update_hash(digest, value[key])
+    elif callable(value):
+        digest.update(inspect.getsource(value).encode())
+    else:
+        digest.update(repr(value).encode())
+
+
+def fingerprint(*values):
+    digest = hashlib.sha256()
+    for value in values:
+        update_hash(digest, value)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    def __init__(self, path=CACHE_PATH, force=False):
+        # force: every output is written again, and recorded for the next runs
+        self.path = path
+        self.force = force
+        self.manifest = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.manifest = json.load(f)
+        self.skipped = 0
+
+    def fresh(self, output, key):
+        if not self.force and self.manifest.get(output) == key and os.path.exists(output):
+            self.skipped += 1
+            return True
+        return False
+
+    def record(self, output, key):
+        self.manifest[output] = key
+
+    def save(self):
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def write_csv(df, path, cache=None, **kwargs):
+    # df.to_csv, skipped when the cache has the same table for this path
+    key = fingerprint(df, kwargs)
+    if cache is not None and cache.fresh(path, key):
+        return False
+    df.to_csv(path, **kwargs)
+    if cache is not None:
+        cache.record(path, key)
+        cache.save()
+    return True
@@ -0,0 +1,140 @@
+# Chart rendering for the analysis report
+# The analyses compute their tables and hand them to render() with one of the renderers below. Inside
+# render_pool() the charts are only queued, and rendered together by a pool of processes when the block ends,
+# otherwise they are rendered right away. Renderers only use object-oriented matplotlib figures (no pyplot
+# state), saved with the Agg canvas, so they can run in any process.
+# With an ArtifactCache, a queued chart is skipped when its file was already rendered from the same data.
+
+import inspect
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from artifact_cache import fingerprint
+
+import matplotlib.dates as mdates
+import matplotlib.ticker as mtick
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Charts queued by render() inside render_pool(), None when charts are rendered right away
+_queued = None
+
+
+def render(renderer, *args, **kwargs):
+    if _queued is not None:
+        _queued.append((renderer, args, kwargs))
+    else:
+        renderer(*args, **kwargs)
+
+
+def chart_path(renderer, args, kwargs):
+    return inspect.signature(renderer).bind(*args, **kwargs).arguments["path"]
+
+
+@contextmanager
+def render_pool(processes=None, cache=None):
+    # Charts rendered by the block are queued, then rendered by processes processes (one per core by default)
+    global _queued
+    _queued = []
+    try:
+        yield
+        charts = _queued
+    finally:
+        _queued = None
+
+    keys = [fingerprint(renderer, args, kwargs) for renderer, args, kwargs in charts]
+    if cache is not None:
+        stale = [index for index, chart in enumerate(charts) if not cache.fresh(chart_path(*chart), keys[index])]
+        charts = [charts[index] for index in stale]
+        keys = [keys[index] for index in stale]
+    with ProcessPoolExecutor(processes) as pool:
+        futures = [pool.submit(renderer, *args, **kwargs) for renderer, args, kwargs in charts]
+        for chart, key, future in zip(charts, keys, futures):
+            future.result()
+            if cache is not None:
+                cache.record(chart_path(*chart), key)
+    if cache is not None:
+        cache.save()
+    print(f"Rendered {len(charts)} charts" + (f", {cache.skipped} unchanged outputs skipped" if cache is not None else ""))
+
+
+def new_figure():
+    fig = Figure(figsize=(12, 6))
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots()
+
+
+def save(fig, path):
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def area_chart(table, path, title, xlabel, ylabel, colors, legend_title=None):
+    # Stacked area chart of the columns of table, as shares
+    fig, ax = new_figure()
+    table.plot.area(ax=ax, stacked=True, color=colors)
+    ax.yaxis.set_major_formatter(mtick.PercentFormatter(xmax=1))
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.legend(title=legend_title, bbox_to_anchor=(1.05, 1), loc='upper left')
+    save(fig, path)
+
+
+def lines_chart(table, path, title, xlabel, ylabel, colors, markers=False, date_axis=False):
+    # One line per column of table, as shares
+    fig, ax = new_figure()
+    for column, color in zip(table.columns, colors):
+        if markers:
+            ax.plot(table.index, table[column], 'o-', label=column, color=color, markersize=4, linewidth=2)
+        else:
+            ax.plot(table.index, table[column], label=column, color=color, linewidth=2)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    ax.yaxis.set_major_formatter(mtick.PercentFormatter(1.0))
+    if date_axis:
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
+        ax.xaxis.set_major_locator(mdates.YearLocator())
+        fig.autofmt_xdate()
+    save(fig, path)
+
+
+def trend_chart(dates, values, path, title, ylabel, plot_type):
+    fig, ax = new_figure()
+    if plot_type == "area":
+        ax.fill_between(dates, values, alpha=0.7)  # alpha controls the transparency
+    elif plot_type == "line":
+        # Create a simple line plot with dots
+        ax.plot(dates, values, 'o-', color='purple', markersize=4, linewidth=1.5)
+    ax.set_title(title)
+    ax.set_xlabel('Date')
+    ax.set_ylabel(ylabel)
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.yaxis.set_major_formatter(mtick.PercentFormatter(xmax=1.0))
+    # Add a subtle line on top of the filled area for better visibility
+    ax.plot(dates, values, color='black', linewidth=0.5)
+    save(fig, path)
+
+
+def trend_bar_chart(dates, values, path, title, ylabel, width):
+    fig, ax = new_figure()
+    ax.bar(dates, values, width=width, align='center')
+    ax.set_title(title)
+    ax.set_xlabel('Date')
+    ax.set_ylabel(ylabel)
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
+    ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+    save(fig, path)
+
+
+def bar_chart(labels, values, path, title, xlabel, ylabel):
+    fig, ax = new_figure()
+    ax.bar(labels, values)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.tick_params(axis='x', labelrotation=45)
+    save(fig, path)
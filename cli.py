@@ -0,0 +1,215 @@
+# Command line entry point for the whole study
+# The stages run in the order given on the command line:
+#   fetch    the whoishiring threads and their comments from the HN API into the store (hacker_news_parsing)
+#   submit   the comments of the store to the Exxa API (the ledger skips what was already submitted)
+#   collect  the results of the submitted requests, until every one is finished
+#   build    the response and postings parquet files from the results
+#   report   the monthly cube, the charts and statistics, and the count of all the technologies
+# e.g. python cli.py build report --analyses remote top-tech tech-groups --tech-groups cloud --months 2020:2024-08 --timings
+#
+# --timings prints the time spent in each stage, --profile profiles them with cProfile (or pyinstrument when it
+# is installed and asked for). Charts are rendered in worker processes, which are not profiled: use
+# --processes 1 to see them in the profile.
+
+import argparse
+import cProfile
+import importlib.util
+import os
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+
+from postings import DATASET_PATH
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PARSING_DIR = os.path.join(ROOT, "hacker_news_parsing")
+STAGES = ["fetch", "submit", "collect", "build", "report"]
+
+
+def load_script(file_name):
+    # The stage scripts have dashes in their names, they are loaded from their path
+    name = file_name[:-len(".py")].replace("-", "_")
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, file_name))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+
+def month_range(value):
+    # '2024-08' -> ['2024-08'], '2024' -> the 12 months of 2024, '2020-03:2021' -> 2020-03 to 2021-12
+    start, _, end = value.partition(":")
+    end = end or start
+    try:
+        first = (int(start[:4]), int(start[5:7]) if len(start) > 4 else 1)
+        last = (int(end[:4]), int(end[5:7]) if len(end) > 4 else 12)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY, YYYY-MM or a range START:END, got {value}")
+    if not (1 <= first[1] <= 12 and 1 <= last[1] <= 12):
+        raise argparse.ArgumentTypeError(f"months go from 01 to 12, got {value}")
+    if first > last:
+        raise argparse.ArgumentTypeError(f"the range starts after its end, got {value}")
+    months = []
+    year, month = first
+    while (year, month) <= last:
+        months.append(f"{year}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+class StageRunner:
+    def __init__(self, timings=False, profile=False, profiler="cprofile", profile_output=None):
+        self.timings = timings
+        self.profile_output = profile_output
+        self.elapsed = []
+        self.profiler = None
+        if profile and profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+                self.profiler = Profiler()
+            except ImportError:
+                print("pyinstrument is not installed, profiling with cProfile")
+        if profile and self.profiler is None:
+            self.profiler = cProfile.Profile()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.enable()
+        elif self.profiler is not None:
+            self.profiler.start()
+        try:
+            yield
+        finally:
+            if isinstance(self.profiler, cProfile.Profile):
+                self.profiler.disable()
+            elif self.profiler is not None:
+                self.profiler.stop()
+            self.elapsed.append((name, time.perf_counter() - start))
+            if self.timings:
+                print(f"[{name}] {self.elapsed[-1][1]:.2f}s")
+
+    def report(self):
+        if self.timings and len(self.elapsed) > 1:
+            print("Timings:")
+            for name, elapsed in self.elapsed:
+                print(f"  {name:<12} {elapsed:8.2f}s")
+            print(f"  {'total':<12} {sum(elapsed for _, elapsed in self.elapsed):8.2f}s")
+        if isinstance(self.profiler, cProfile.Profile):
+            if self.profile_output:
+                self.profiler.dump_stats(self.profile_output)
+                print(f"Profile saved to {self.profile_output}")
+            else:
+                pstats.Stats(self.profiler).sort_stats("cumulative").print_stats(30)
+        elif self.profiler is not None:
+            if self.profile_output:
+                with open(self.profile_output, "w") as f:
+                    f.write(self.profiler.output_html())
+                print(f"Profile saved to {self.profile_output}")
+            else:
+                print(self.profiler.output_text(unicode=True))
+
+
+def fetch(args, runner):
+    # The parsing scripts import each other as top-level modules
+    sys.path.insert(0, PARSING_DIR)
+    import asyncio
+    from fetch_offers import main as fetch_comments
+    from utils import hn_api_url
+    from utils_threads import fetch_whoishiring_threads
+
+    base_url = args.base_url or hn_api_url
+    with runner.stage("fetch"):
+        fetch_whoishiring_threads(sync=args.sync, base_url=base_url)
+        asyncio.run(fetch_comments(concurrency=args.fetch_concurrency, sync=args.sync, replies=args.replies, base_url=base_url))
+
+
+def submit(args, runner):
+    llm = load_script("HackerNews-study-llm-processing.py")
+    with runner.stage("submit"):
+        llm.start_process_store(months=args.months, concurrency=args.concurrency, rate=args.rate, near_duplicates=args.near_duplicates)
+
+
+def collect(args, runner):
+    llm = load_script("HackerNews-study-llm-processing.py")
+    with runner.stage("collect"):
+        llm.result_to_jsonl(args.results, concurrency=args.concurrency, rate=args.rate)
+
+
+def build(args, runner):
+    llm = load_script("HackerNews-study-llm-processing.py")
+    with runner.stage("build"):
+        llm.hackernews_result_to_dataset(args.results)
+        llm.expand_extracted_content(output_path=args.dataset)
+
+
+def report(args, runner):
+    analysis = load_script("HackerNews-study-data-analysis.py")
+    with runner.stage("cube"):
+        cube = analysis.update_cube(args.dataset, analysis.CUBE_PATH)
+    with runner.stage("report"):
+        analysis.temporal_analysis(args.dataset, processes=args.processes, use_cache=not args.no_cache, cube=cube,
+                                   analyses=args.analyses, months=args.months, tech_groups=args.tech_groups)
+    if args.all_techs:
+        with runner.stage("all techs"):
+            analysis.analyze_all_tech_stack(args.dataset, use_cache=not args.no_cache, cube=cube)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="HN Who is hiring study: run the stages given, in order")
+    parser.add_argument("stages", nargs="+", choices=STAGES, metavar="stage", help=", ".join(STAGES))
+    parser.add_argument("--timings", action="store_true", help="print the time spent in each stage")
+    parser.add_argument("--profile", action="store_true", help="profile the stages")
+    parser.add_argument("--profiler", choices=["cprofile", "pyinstrument"], default="cprofile")
+    parser.add_argument("--profile-output", help="save the profile (.prof for cProfile, .html for pyinstrument) instead of printing it")
+    parser.add_argument("--months", nargs="+", type=month_range, metavar="MONTHS",
+                        help="only submit / analyze these months: YYYY-MM, YYYY or START:END")
+
+    fetching = parser.add_argument_group("fetch")
+    fetching.add_argument("--sync", action="store_true", help="only fetch new threads and new or changed comments")
+    fetching.add_argument("--replies", action="store_true", help="also crawl the reply tree of each thread")
+    fetching.add_argument("--fetch-concurrency", type=int, default=64)
+    fetching.add_argument("--base-url", help="HN API base url, e.g. a local fake_hn_server.py")
+
+    llm = parser.add_argument_group("submit, collect, build")
+    llm.add_argument("--concurrency", type=int, default=16)
+    llm.add_argument("--rate", type=float, default=10.0, help="requests per second")
+    llm.add_argument("--near-duplicates", action="store_true", help="also skip the comments nearly identical to a submitted one")
+    llm.add_argument("--results", default="exxa_api_response_done.jsonl")
+    llm.add_argument("--dataset", default=DATASET_PATH)
+
+    reporting = parser.add_argument_group("report")
+    reporting.add_argument("--analyses", nargs="+", metavar="ANALYSIS", help="only run these analyses (see ANALYSES)")
+    reporting.add_argument("--tech-groups", nargs="+", metavar="GROUP", help="only compare these tech groups (see TECH_GROUPS)")
+    reporting.add_argument("--processes", type=int, help="chart rendering processes (one per core by default)")
+    reporting.add_argument("--no-cache", action="store_true", help="write every chart and csv file, even unchanged")
+    reporting.add_argument("--no-all-techs", dest="all_techs", action="store_false", help="skip all_technologies_count.csv")
+
+    args = parser.parse_args(argv)
+    if args.analyses or args.tech_groups:
+        analysis = load_script("HackerNews-study-data-analysis.py")
+        for name in set(args.analyses or []) - set(analysis.ANALYSES):
+            parser.error(f"unknown analysis {name}, expected one of {', '.join(analysis.ANALYSES)}")
+        for name in set(args.tech_groups or []) - set(analysis.TECH_GROUPS):
+            parser.error(f"unknown tech group {name}, expected one of {', '.join(analysis.TECH_GROUPS)}")
+    if args.months is not None:
+        args.months = sorted({month for months in args.months for month in months})
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    runner = StageRunner(args.timings, args.profile, args.profiler, args.profile_output)
+    stages = {"fetch": fetch, "submit": submit, "collect": collect, "build": build, "report": report}
+    try:
+        for name in args.stages:
+            stages[name](args, runner)
+    finally:
+        runner.report()
+
+
+if __name__ == "__main__":
+    main()
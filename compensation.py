@@ -0,0 +1,39 @@
+# Compensation helpers shared by the analyses
+# The extracted amounts are in thousands of USD (see model.py). SalaryBins buckets them with one vectorized
+# pd.cut: the edges and labels are configurable, amounts can be rescaled (other unit or currency rate) and
+# outliers above a cap ignored. The cube counts the ranges by month and by country, for the compensation histograms.
+
+import numpy as np
+import pandas as pd
+
+# Averages above this (in thousands of USD) are extraction errors, e.g. a yearly amount in USD
+MAX_COMPENSATION = 1000
+
+SALARY_EDGES = [0, 100, 120, 140, 160, 180, 200, 220, np.inf]
+SALARY_LABELS = [
+    '$0-100k', '$100k-120k', '$120k-140k', '$140k-160k',
+    '$160k-180k', '$180k-200k', '$200k-220k', '$220k+'
+]
+
+
+def average_compensation(data):
+    return (data['compensation_min'] + data['compensation_max']) / 2
+
+
+class SalaryBins:
+    def __init__(self, edges=SALARY_EDGES, labels=SALARY_LABELS, scale=1.0, max_value=None):
+        # scale: multiplies the amounts before they are binned (e.g. an exchange rate),
+        # max_value: amounts above it (after scaling) are left without a bucket
+        if len(labels) != len(edges) - 1:
+            raise ValueError(f"{len(edges)} edges need {len(edges) - 1} labels, got {len(labels)}")
+        self.edges = edges
+        self.labels = labels
+        self.scale = scale
+        self.max_value = max_value
+
+    def categorize(self, amounts):
+        # Categorical Series of the bucket of each amount, lower edge included, missing when out of range
+        amounts = amounts * self.scale
+        if self.max_value is not None:
+            amounts = amounts.where(amounts <= self.max_value)
+        return pd.cut(amounts, bins=self.edges, labels=self.labels, right=False)
@@ -0,0 +1,212 @@
+# Monthly aggregate cube of the processed postings
+# The analyses only need counts and sums per period: the postings of each month are aggregated once into cells
+# (year, month, status, dimension, category) -> count, sum, stored in a Parquet file next to the dataset with a
+# hash of the rows of each month. When the dataset changes, only the months that are new or whose rows changed
+# are aggregated again, the cells of the other months are kept. Yearly tables are sums of the monthly cells.
+# Dimensions: the categorical fields and salary ranges (one count per posting), the list fields (one count per
+# item), and for the numeric fields the number of values and their sum, from which the means are derived.
+
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from artifact_cache import fingerprint
+from compensation import MAX_COMPENSATION, SALARY_EDGES, SALARY_LABELS, SalaryBins, average_compensation
+from postings import DATASET_PATH, LIST_FIELDS, read_postings
+from tech_normalization import NORMALIZER, VERSION_SUFFIX_RE, TechNormalizer, normalize_techs
+
+CUBE_PATH = "HN_case_study_cube.parquet"
+
+# Columns of the dataset aggregated in the cube
+CUBE_COLUMNS = [
+    'year', 'month', 'comment_status', 'remote', 'visa_sponsoring', 'countries', 'tech_stack', 'job_type',
+    'seniority_level', 'compensation_min', 'compensation_max', 'company_size', 'fundraising_round',
+]
+
+CUBE_SCHEMA = pa.schema([
+    ("year", pa.int64()), ("month", pa.int64()), ("status", pa.string()), ("dimension", pa.string()),
+    ("category", pa.string()), ("count", pa.int64()), ("sum", pa.float64()),
+])
+CELL_KEYS = ['year', 'month', 'status', 'dimension', 'category']
+
+
+def aggregate(df):
+    # Cells of the postings of df, one row per (year, month, status, dimension, category)
+    df = df.dropna(subset=['year', 'month'])
+    keys = pd.DataFrame({
+        'year': df['year'].astype('int64'),
+        'month': df['month'].astype('int64'),
+        'status': df['comment_status'].astype(object),
+    }, index=df.index)
+    average = average_compensation(df)
+    salary_range = SalaryBins(max_value=MAX_COMPENSATION).categorize(average)
+    # GB is counted as UK
+    countries = df['countries'].explode().replace('GB', 'UK').dropna()
+    country_ranges = salary_range.loc[countries.index]
+    techs = df['tech_stack'].explode().dropna()
+    techs = techs[techs.str.strip() != '']
+
+    # {dimension: category of each posting (or of each item, with the index of its posting)}
+    categories = {
+        'postings': pd.Series('', index=df.index),
+        'comment_status': df['comment_status'],
+        'remote': df['remote'],
+        # The job types are counted as combinations, the way they were stored before they were kept as lists
+        'job_type_label': df['job_type'].map(','.join),
+        'company_size': df['company_size'],
+        'fundraising_round': df['fundraising_round'],
+        'salary_category': SalaryBins().categorize(average),
+        # The same ranges without the outliers, for the distribution of the salaries
+        'salary_range': salary_range,
+        # Salary range of each country of a posting, as 'country|range', for the salary histograms by region
+        'country_salary_range': (countries + '|' + country_ranges.astype(str))[country_ranges.notna().to_numpy()],
+        'empty': pd.Series('tech_stack', index=df.index)[df['tech_stack'].str.len() == 0],
+        'seniority_level': df['seniority_level'].explode(),
+        'countries': countries,
+        # Normalized names for the tech analyses, only lowercased for the count of all the names
+        'tech': normalize_techs(techs),
+        'tech_name': techs.str.lower().str.strip(),
+    }
+    # {dimension: value of each posting}, amounts above MAX_COMPENSATION are extraction errors
+    values = {
+        'visa_sponsoring': df['visa_sponsoring'].astype('Float64'),
+        'compensation_min': df['compensation_min'].where(df['compensation_min'] <= MAX_COMPENSATION),
+        'compensation_max': df['compensation_max'].where(df['compensation_max'] <= MAX_COMPENSATION),
+        'average_compensation': average.where(average <= MAX_COMPENSATION),
+    }
+
+    frames = []
+    for dimension, category in categories.items():
+        category = category.dropna()
+        frames.append(keys.loc[category.index].assign(
+            dimension=dimension, category=category.astype(str).to_numpy(), count=1, sum=0.0))
+    for dimension, value in values.items():
+        value = value.dropna()
+        frames.append(keys.loc[value.index].assign(
+            dimension=dimension, category='', count=1, sum=value.to_numpy(dtype='float64')))
+    cells = pd.concat(frames, ignore_index=True)
+    return cells.groupby(CELL_KEYS, dropna=False)[['count', 'sum']].sum().reset_index()
+
+
+def month_hashes(df):
+    # {'YYYY-MM': hash of the rows of the month}, the hash does not depend on the order of the rows
+    df = df.dropna(subset=['year', 'month'])
+    rows = df.assign(**{name: df[name].map(lambda values: '\x1f'.join(map(str, values)))
+                        for name in LIST_FIELDS.intersection(df.columns)})
+    hashes = pd.util.hash_pandas_object(rows, index=False)
+    # The sums wrap around in uint64
+    hashes = hashes.groupby([df['year'].astype('int64'), df['month'].astype('int64')]).sum()
+    return {f"{year}-{month:02d}": str(value) for (year, month), value in hashes.items()}
+
+
+def cube_key():
+    # The cells depend on the aggregation and the code it calls, the tech aliases and the salary ranges, the month
+    # hashes on how they are computed: the cube is built again when one of them changes
+    return fingerprint(
+        aggregate, month_hashes, TechNormalizer, normalize_techs, VERSION_SUFFIX_RE.pattern, VERSION_SUFFIX_RE.flags,
+        NORMALIZER.aliases, SalaryBins, average_compensation, SALARY_EDGES, SALARY_LABELS, MAX_COMPENSATION,
+    )
+
+
+class MonthlyCube:
+    def __init__(self, cells, key=None, hashes=None):
+        self.key = key
+        # month_hashes() of the rows the cells were aggregated from
+        self.hashes = hashes or {}
+        if 'year_month' not in cells.columns:
+            # The labels are built once per month, not per cell
+            months = cells[['year', 'month']].drop_duplicates()
+            labels = pd.Series(
+                (months['year'].astype(str) + '-' + months['month'].astype(str).str.zfill(2)).to_numpy(),
+                index=pd.MultiIndex.from_frame(months),
+            )
+            cells = cells.assign(year_month=labels.reindex(pd.MultiIndex.from_frame(cells[['year', 'month']])).to_numpy())
+        self.cells = cells
+        self._dimensions = None
+        self._sizes = {}
+        self._counts = {}
+
+    @classmethod
+    def load(cls, path=CUBE_PATH, key=None):
+        # The cube stored at path, empty when there is none or when it was built with another key
+        if os.path.exists(path):
+            table = pq.read_table(path)
+            metadata = table.schema.metadata or {}
+            if key is None or metadata.get(b"key") == key.encode():
+                return cls(table.to_pandas(), key, json.loads(metadata.get(b"hashes", b"{}")))
+        return cls(CUBE_SCHEMA.empty_table().to_pandas(), key)
+
+    def save(self, path=CUBE_PATH):
+        table = pa.Table.from_pandas(self.cells[CUBE_SCHEMA.names], schema=CUBE_SCHEMA, preserve_index=False)
+        table = table.replace_schema_metadata({"key": self.key or "", "hashes": json.dumps(self.hashes)})
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def select(self, status=None, months=None, years=None):
+        # Cube of the cells of one comment status and of some year-months ('2024-09') or years
+        mask = pd.Series(True, index=self.cells.index)
+        if status is not None:
+            mask &= self.cells['status'] == status
+        if months is not None:
+            mask &= self.cells['year_month'].isin(months)
+        if years is not None:
+            mask &= self.cells['year'].isin(years)
+        return MonthlyCube(self.cells[mask], self.key)
+
+    def dimension(self, dimension):
+        if self._dimensions is None:
+            self._dimensions = dict(tuple(self.cells.groupby('dimension')))
+        return self._dimensions.get(dimension, self.cells.iloc[:0])
+
+    def sizes(self, period):
+        # Number of postings per period ('year' or 'year_month')
+        if period not in self._sizes:
+            self._sizes[period] = self.dimension('postings').groupby(period)['count'].sum()
+        return self._sizes[period]
+
+    def counts(self, dimension, period):
+        # period x category table of the number of postings (of items for the list dimensions)
+        if (dimension, period) not in self._counts:
+            counts = self.dimension(dimension).groupby([period, 'category'])['count'].sum().unstack(fill_value=0)
+            self._counts[dimension, period] = counts.reindex(self.sizes(period).index, fill_value=0).rename_axis(columns=None)
+        return self._counts[dimension, period]
+
+    def shares(self, dimension, period, categories=None):
+        # Counts divided by the number of postings of the period (missing values are counted in the total)
+        counts = self.counts(dimension, period)
+        if categories is not None:
+            counts = counts.reindex(columns=categories, fill_value=0)
+        return counts.div(self.sizes(period), axis=0)
+
+    def means(self, dimension, period):
+        # Mean of a numeric dimension per period, NaN for the periods without any value
+        totals = self.dimension(dimension).groupby(period)[['count', 'sum']].sum().reindex(self.sizes(period).index)
+        return (totals['sum'] / totals['count']).rename(dimension)
+
+    def totals(self, dimension):
+        # Count of each category over all the periods
+        return self.dimension(dimension).groupby('category')['count'].sum()
+
+
+def update_cube(dataset_path=DATASET_PATH, cube_path=CUBE_PATH):
+    # Cube of the dataset, only the months whose rows changed since the cube was stored are aggregated
+    key = cube_key()
+    cube = MonthlyCube.load(cube_path, key)
+    df = read_postings(dataset_path, columns=CUBE_COLUMNS)
+    hashes = month_hashes(df)
+    stale = [month for month, value in hashes.items() if cube.hashes.get(month) != value]
+    unchanged = [month for month in hashes if month not in stale]
+
+    cells = cube.cells[cube.cells['year_month'].isin(unchanged)]
+    if stale or len(cells) != len(cube.cells):
+        if stale:
+            year_month = df['year'].astype('Int64').astype(str) + '-' + df['month'].astype('Int64').astype(str).str.zfill(2)
+            new_cells = aggregate(df[year_month.isin(stale)])
+            cells = pd.concat([cells.drop(columns='year_month'), new_cells], ignore_index=True)
+        cube = MonthlyCube(cells, key, hashes)
+        cube.save(cube_path)
+    print(f"Aggregated {len(stale)} months into {cube_path}, {len(unchanged)} unchanged months reused")
+    return cube
@@ -0,0 +1,90 @@
+# Deduplication of job postings before they are sent to the LLM
+# Many companies post the same text every month: exact repeats (after normalization) are detected with a
+# content hash, near-identical ones (e.g. only a date or an emoji changed) optionally with a 64-bit SimHash.
+# Duplicates are not submitted, they reuse the extraction of the first posting with the same content.
+
+import hashlib
+import html
+import re
+
+import numpy as np
+
+TAG_RE = re.compile(r"<[^>]+>")
+WORD_RE = re.compile(r"\w+")
+SPACE_RE = re.compile(r"\s+")
+
+SIMHASH_BITS = 64
+# Two postings whose SimHash differ by at most this many bits are considered the same
+SIMHASH_MAX_DISTANCE = 3
+# With 4 bands of 16 bits, two hashes within 3 bits share at least one identical band
+SIMHASH_BANDS = 4
+
+
+def normalize_text(text):
+    text = html.unescape(TAG_RE.sub(" ", text))
+    return SPACE_RE.sub(" ", text).strip().lower()
+
+
+def content_hash(text):
+    return hashlib.sha1(normalize_text(text).encode()).hexdigest()
+
+
+def simhash(text):
+    words = WORD_RE.findall(normalize_text(text))
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    digests = b"".join(hashlib.blake2b(shingle.encode(), digest_size=8).digest() for shingle in shingles)
+    # One row of 64 bits per shingle, a bit of the SimHash is set when most shingles have it set
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(len(shingles), SIMHASH_BITS)
+    return int.from_bytes(np.packbits(bits.sum(axis=0) * 2 > len(shingles)).tobytes(), "big")
+
+
+class SimHashIndex:
+    # Band index so a lookup only compares against hashes sharing one 16-bit band, not against everything
+    def __init__(self):
+        self.bands = [{} for _ in range(SIMHASH_BANDS)]
+
+    def band_keys(self, value):
+        width = SIMHASH_BITS // SIMHASH_BANDS
+        return [value >> (i * width) & ((1 << width) - 1) for i in range(SIMHASH_BANDS)]
+
+    def add(self, value, key):
+        for band, band_key in zip(self.bands, self.band_keys(value)):
+            band.setdefault(band_key, []).append((value, key))
+
+    def find(self, value):
+        for band, band_key in zip(self.bands, self.band_keys(value)):
+            for other, key in band.get(band_key, []):
+                if bin(value ^ other).count("1") <= SIMHASH_MAX_DISTANCE:
+                    return key
+        return None
+
+
+def find_duplicates(comments, known_hashes, known_simhashes=(), near_duplicates=False):
+    # Returns ({comment_id: (content_hash, simhash)}, {duplicate comment_id: canonical comment_id})
+    # known_hashes maps content hashes already submitted to their comment_id, known_simhashes lists
+    # (simhash, comment_id) pairs already submitted. The first comment with a new content is canonical.
+    hashes = dict(known_hashes)
+    index = SimHashIndex()
+    if near_duplicates:
+        for value, comment_id in known_simhashes:
+            index.add(value, comment_id)
+
+    fingerprints = {}
+    duplicates = {}
+    for comment in comments:
+        comment_id = str(comment["id"])
+        text_hash = content_hash(comment["text"])
+        text_simhash = simhash(comment["text"]) if near_duplicates else None
+        fingerprints[comment_id] = (text_hash, text_simhash)
+
+        canonical = hashes.get(text_hash)
+        if canonical is None and near_duplicates:
+            canonical = index.find(text_simhash)
+        if canonical is not None and canonical != comment_id:
+            duplicates[comment_id] = canonical
+            continue
+
+        hashes[text_hash] = comment_id
+        if near_duplicates:
+            index.add(text_simhash, comment_id)
+    return fingerprints, duplicates
@@ -0,0 +1,132 @@
+# Async client for the Exxa API, shared by the submission and collection stages
+# One pooled HTTP/2 client, a global rate limiter, bounded concurrency and retries with jitter on 429/5xx
+
+import asyncio
+import os
+import random
+import time
+
+import httpx
+
+URL = "https://api.withexxa.com"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    # Token bucket: `rate` requests per second on average, bursts of at most `burst`
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RequestStats:
+    def __init__(self, label, total=None, report_every=500):
+        self.label = label
+        self.total = total
+        self.report_every = report_every
+        self.latencies = []
+        self.retries = 0
+        self.failures = 0
+        self.start_time = time.perf_counter()
+
+    def record(self, latency):
+        self.latencies.append(latency)
+        if len(self.latencies) % self.report_every == 0:
+            self.report()
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))]
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start_time
+        done = len(self.latencies)
+        rate = done / elapsed if elapsed > 0 else 0.0
+        progress = f"{done}/{self.total}" if self.total is not None else f"{done}"
+        eta = f", ETA {(self.total - done) / rate:.0f}s" if self.total is not None and rate > 0 else ""
+        print(
+            f"{self.label}: {progress} requests in {elapsed:.1f}s ({rate:.1f} req/s{eta}), "
+            f"p50 {self.percentile(50) * 1000:.0f}ms, p99 {self.percentile(99) * 1000:.0f}ms, "
+            f"{self.retries} retries, {self.failures} failures"
+        )
+
+
+class ExxaClient:
+    def __init__(self, api_key=None, base_url=URL, concurrency=16, rate=10.0, max_retries=6, backoff_base=1.0, timeout=60):
+        self.api_key = api_key or os.environ["EXXA_API_KEY"]
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(rate)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self.client = None
+        self.semaphore = None
+
+    async def __aenter__(self):
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"X-API-Key": self.api_key, "Content-Type": "application/json"},
+            timeout=self.timeout,
+            limits=limits,
+            http2=True,
+        )
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+
+    def retry_delay(self, attempt, response=None):
+        # Honor Retry-After when the API sends one, otherwise exponential backoff with full jitter
+        if response is not None and "retry-after" in response.headers:
+            try:
+                return float(response.headers["retry-after"])
+            except ValueError:
+                pass
+        return random.uniform(0, self.backoff_base * 2**attempt)
+
+    async def request(self, method, path, stats, **kwargs):
+        # Returns the decoded JSON body, or raises the last error once the retries are exhausted
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                await self.rate_limiter.acquire()
+                async with self.semaphore:
+                    start = time.perf_counter()
+                    response = await self.client.request(method, path, **kwargs)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    stats.record(time.perf_counter() - start)
+                    return response.json()
+                error = httpx.HTTPStatusError(f"{response.status_code} on {path}", request=response.request, response=response)
+            except httpx.TransportError as e:
+                error = e
+            if attempt == self.max_retries:
+                raise error
+            stats.retries += 1
+            await asyncio.sleep(self.retry_delay(attempt, response))
+
+    async def submit(self, payload, stats):
+        return await self.request("POST", "/v1/requests", stats, json=payload)
+
+    async def get_request(self, request_id, stats):
+        return await self.request("GET", f"/v1/requests/{request_id}", stats)
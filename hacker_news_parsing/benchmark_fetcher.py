@@ -0,0 +1,44 @@
+# Benchmark of the comment fetcher against the local fake HN API, at several concurrency settings
+# Usage: python benchmark_fetcher.py --items 2000 --latency-ms 50 --jitter-ms 100 --error-rate 0.01 --concurrency 8 32 128
+
+import argparse
+import asyncio
+
+from fake_hn_server import ID_STRIDE, start_server_process
+from fetcher import Fetcher, FetchStats
+
+
+async def run_benchmark(base_url, item_ids, concurrency):
+    stats = FetchStats()
+    async with Fetcher(concurrency=concurrency, backoff_base=0.05, base_url=base_url) as fetcher:
+        await fetcher.fetch_items(item_ids, label=f"concurrency {concurrency}", stats=stats)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 16, 32, 64, 128])
+    args = parser.parse_args()
+
+    server, base_url = start_server_process(
+        threads=1, thread_size=args.items, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate
+    )
+    item_ids = [ID_STRIDE + i for i in range(1, args.items + 1)]
+
+    results = []
+    for concurrency in args.concurrency:
+        stats = asyncio.run(run_benchmark(base_url, item_ids, concurrency))
+        results.append((concurrency, stats))
+    server.terminate()
+
+    print(f"\n{'concurrency':>11} {'items/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'retries':>8} {'failures':>8}")
+    for concurrency, stats in results:
+        elapsed = stats.elapsed()
+        print(
+            f"{concurrency:>11} {len(stats.latencies) / elapsed:>9.1f} {stats.percentile(50) * 1000:>8.0f} "
+            f"{stats.percentile(99) * 1000:>8.0f} {stats.retries:>8} {len(stats.failures):>8}"
+        )
@@ -0,0 +1,147 @@
+# Local stand-in for the HN Firebase API, to test and benchmark the fetchers without hitting the real API
+# Serves /v0/user/whoishiring.json and /v0/item/{id}.json with generated threads and comments.
+# Usage: python fake_hn_server.py --threads 12 --thread-size 1000 --latency-ms 50 --error-rate 0.01
+# then run fetch_offers.py --base-url http://127.0.0.1:8765/v0
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import re
+from http import HTTPStatus
+
+# Comments of thread t get ids t * ID_STRIDE + k, their replies t * ID_STRIDE + REPLY_OFFSET + k
+ID_STRIDE = 1_000_000
+REPLY_OFFSET = 500_000
+FIRST_THREAD_TIME = 1301616000  # 2011-04-01
+MONTH = 30 * 24 * 60 * 60
+
+
+class FakeHN:
+    def __init__(self, threads=12, thread_size=1000, replies=False, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=0):
+        self.threads = threads
+        self.thread_size = thread_size
+        self.replies = replies
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    def user(self, user_id):
+        if user_id != "whoishiring":
+            return None
+        return {"id": user_id, "submitted": list(range(self.threads, 0, -1))}
+
+    def item(self, item_id):
+        thread_id, k = divmod(item_id, ID_STRIDE)
+        if thread_id == 0 and 1 <= k <= self.threads:
+            return {
+                "id": k,
+                "by": "whoishiring",
+                "type": "story",
+                "time": FIRST_THREAD_TIME + (k - 1) * MONTH,
+                "title": f"Ask HN: Who is hiring? (Month {k})",
+                "kids": [k * ID_STRIDE + i for i in range(1, self.thread_size + 1)],
+            }
+        if not 1 <= thread_id <= self.threads:
+            return None
+        parent_k = k - REPLY_OFFSET if k > REPLY_OFFSET else k
+        if not 1 <= parent_k <= self.thread_size:
+            return None
+        is_reply = k > REPLY_OFFSET
+        comment = {
+            "id": item_id,
+            "by": f"user{parent_k}",
+            "type": "comment",
+            "parent": thread_id * ID_STRIDE + parent_k if is_reply else thread_id,
+            "time": FIRST_THREAD_TIME + (thread_id - 1) * MONTH + parent_k * 60 + (30 if is_reply else 0),
+            "text": f"Company {parent_k} | Senior Engineer | REMOTE | Python, Postgres, React<p>Posting {item_id}.",
+        }
+        if self.replies and not is_reply:
+            comment["kids"] = [thread_id * ID_STRIDE + REPLY_OFFSET + parent_k]
+        return comment
+
+    def delay(self):
+        return (self.latency_ms + self.random.uniform(0, self.jitter_ms)) / 1000
+
+    def should_fail(self):
+        return self.random.random() < self.error_rate
+
+    def respond(self, path):
+        path = path.split("?")[0]
+        match = re.fullmatch(r"/v0/item/(\d+)\.json", path)
+        if match:
+            return 200, self.item(int(match.group(1)))
+        match = re.fullmatch(r"/v0/user/([\w-]+)\.json", path)
+        if match:
+            return 200, self.user(match.group(1))
+        return 404, {"error": "not found"}
+
+
+async def handle_connection(fake, reader, writer):
+    # Minimal HTTP/1.1 with keep-alive, enough for GET requests from httpx
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            path = request_line.split()[1].decode()
+
+            delay = fake.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if fake.should_fail():
+                status, data = 500, {"error": "injected failure"}
+            else:
+                status, data = fake.respond(path)
+
+            body = json.dumps(data).encode()
+            writer.write(
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+    except (ConnectionError, IndexError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(fake, host, port, port_queue=None):
+    server = await asyncio.start_server(lambda reader, writer: handle_connection(fake, reader, writer), host, port, backlog=1024)
+    port = server.sockets[0].getsockname()[1]
+    if port_queue is not None:
+        port_queue.put(port)
+    print(f"Fake HN API listening on http://{host}:{port}/v0")
+    async with server:
+        await server.serve_forever()
+
+
+def serve_in_process(port_queue, host, port, fake_options):
+    asyncio.run(serve(FakeHN(**fake_options), host, port, port_queue))
+
+
+def start_server_process(host="127.0.0.1", port=0, **fake_options):
+    # Runs the fake API in a separate process and returns (process, base_url); port 0 picks a free port
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve_in_process, args=(port_queue, host, port, fake_options), daemon=True)
+    process.start()
+    return process, f"http://{host}:{port_queue.get(timeout=10)}/v0"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--threads", type=int, default=12)
+    parser.add_argument("--thread-size", type=int, default=1000)
+    parser.add_argument("--replies", action="store_true")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeHN(args.threads, args.thread_size, args.replies, args.latency_ms, args.jitter_ms, args.error_rate)
+    asyncio.run(serve(fake, "127.0.0.1", args.port))
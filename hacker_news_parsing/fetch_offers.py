@@ -1,70 +1,155 @@
 # Get all the comments ids from each thread + the date of the thread
-# https://hacker-news.firebaseio.com/v0/item/{thread_id}.json?print=pretty
+# https://hacker-news.firebaseio.com/v0/item/{thread_id}.json
 
 # Get the content of each comment + the date of the comment
-# https://hacker-news.firebaseio.com/v0/item/{comment_id}.json?print=pretty
+# https://hacker-news.firebaseio.com/v0/item/{comment_id}.json
 
-from datetime import datetime
-import json
-import os
-import asyncio
-import httpx
+# Everything is stored in the SQLite store (see store.py)
 
+import argparse
+import asyncio
+import time
+
+from fetcher import Fetcher, FetchStats
+from replies import crawl_replies
+from store import (
+    comment_states,
+    failed_ids,
+    hiring_threads,
+    mark_comments_fetched,
+    open_store,
+    record_failures,
+    upsert_comments,
+)
 from utils import hn_api_url
 from utils_threads import fetch_whoishiring_threads
 
-os.makedirs("output", exist_ok=True)
-
-assert os.path.exists(
-    "output/whoishiring_threads.jsonl"
-), "Please run fetch_threads.py first"
-
-
-async def fetch_comment(client, comment_id):
-    response = await client.get(f"{hn_api_url}/item/{comment_id}.json?print=pretty")
-    return response.json()
-
-
-async def fetch_comments(comment_ids):
-    async with httpx.AsyncClient(timeout=60) as client:
-        tasks = [fetch_comment(client, comment_id) for comment_id in comment_ids]
-        return await asyncio.gather(*tasks)
-
-
-async def main():
-    with open("output/whoishiring_threads.jsonl", "r") as f:
-        for line in f.readlines():
-            thread_data = json.loads(line)
-
-            deleted = thread_data.get("deleted", False)
-            dead = thread_data.get("dead", False)
-            kids = thread_data.get("kids", [])
-            title = thread_data.get("title", "")
-            hiring = "hiring" in title.lower()
-
-            # We only want to parse the thread if it is not deleted, not dead, has kids and has "hiring" in the title
-            # (We want to avoid Who wants to be hired posts)
-            if not deleted and not dead and len(kids) > 0 and hiring:
-                timestamp = datetime.fromtimestamp(int(thread_data["time"]))
-
-                # Make a directory with the date in YYYY-MM-DD format
-                date_dir = "output/" + timestamp.strftime("%Y-%m-%d") + "/" + thread_data["title"].replace(" ", "_")
-
-                os.makedirs(date_dir, exist_ok=True)
-
-                if not os.path.exists(f"{date_dir}/thread.json"):
-                    with open(f"{date_dir}/thread.json", "w") as f:
-                        json.dump(thread_data, f, indent=4)
-
-                if not os.path.exists(f"{date_dir}/comments.jsonl"):
-                    comments_data = await fetch_comments(thread_data["kids"])
-
-                    with open(f"{date_dir}/comments.jsonl", "w") as f:
-                        for comment_data in comments_data:
-                            f.write(json.dumps(comment_data) + "\n")
+# HN comments can be edited for two hours after posting, after that their text is frozen
+EDIT_WINDOW = 2 * 60 * 60
+
+
+class ThreadJob:
+    # Comments of one thread being fetched; stored as soon as the last one comes back
+    def __init__(self, conn, thread, comment_ids):
+        self.conn = conn
+        self.thread = thread
+        self.comment_ids = comment_ids
+        self.remaining = len(comment_ids)
+        self.results = {}
+        self.stats = FetchStats()
+
+    def add(self, comment_id, comment_data):
+        self.results[comment_id] = comment_data
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.finish()
+
+    def finish(self):
+        fetched_at = time.time()
+        fetched = [comment_data for comment_data in self.results.values() if comment_data is not None]
+        upsert_comments(self.conn, self.thread["id"], self.thread["month"], fetched, fetched_at)
+        record_failures(self.conn, self.thread["id"], self.stats.failures)
+        mark_comments_fetched(self.conn, self.thread["id"], fetched_at)
+        self.conn.commit()
+        self.stats.report(f"{self.thread['month']} {self.thread['title']}")
+        self.results = {}
+
+    def fail(self, error):
+        # The comments of the job could not be stored: they are recorded as failed and fetched again on the next run
+        self.conn.rollback()
+        record_failures(self.conn, self.thread["id"], {comment_id: repr(error) for comment_id in self.comment_ids})
+        self.conn.commit()
+        self.results = {}
+
+
+def comments_to_fetch(conn, thread):
+    # New kids, plus known comments that were fetched while still editable (they may have changed since)
+    states = comment_states(conn, thread["id"])
+    comment_ids = []
+    for comment_id in thread["kids"]:
+        if comment_id not in states:
+            comment_ids.append(comment_id)
+        else:
+            comment_time, deleted, fetched_at = states[comment_id]
+            if not deleted and comment_time is not None and fetched_at - comment_time < EDIT_WINDOW:
+                comment_ids.append(comment_id)
+    return comment_ids
+
+
+def thread_jobs(conn, sync=False):
+    for thread in hiring_threads(conn):
+        if thread["comments_fetched_at"] is None:
+            comment_ids = thread["kids"]
+        elif sync:
+            # Only the diff against the current kids, plus what failed last time
+            comment_ids = comments_to_fetch(conn, thread) + failed_ids(conn, thread["id"])
+        else:
+            # Retry only the comments that failed on a previous run
+            comment_ids = failed_ids(conn, thread["id"])
+
+        comment_ids = list(dict.fromkeys(comment_ids))
+        if comment_ids:
+            yield ThreadJob(conn, thread, comment_ids)
+
+
+async def fetch_worker(fetcher, queue):
+    # An error is logged and recorded in the store, it never stops the worker
+    while True:
+        job, comment_id = await queue.get()
+        try:
+            try:
+                comment_data = await fetcher.fetch_item(comment_id, job.stats)
+            except Exception as e:
+                # Counted as a failed comment, the rest of the job is still stored
+                job.stats.failures[comment_id] = repr(e)
+                comment_data = None
+            job.add(comment_id, comment_data)
+        except Exception as e:
+            print(f"Storing {job.thread['month']} {job.thread['title']} failed: {e!r}")
+            try:
+                job.fail(e)
+            except Exception as e:
+                print(f"Recording the failure of {job.thread['month']} {job.thread['title']} failed: {e!r}")
+        finally:
+            queue.task_done()
+
+
+async def main(concurrency=64, sync=False, replies=False, base_url=hn_api_url, conn=None):
+    conn = conn or open_store()
+
+    # All threads share one client and one pool of workers: the whole backfill is a single stream of
+    # comment ids, so it is bounded by total comments / concurrency rather than by the number of months.
+    # The queue is bounded so only a few threads are in flight at any time.
+    queue = asyncio.Queue(maxsize=concurrency * 4)
+    start_time = time.perf_counter()
+    total_comments = 0
+    async with Fetcher(concurrency=concurrency, timeout=60, base_url=base_url) as fetcher:
+        workers = [asyncio.create_task(fetch_worker(fetcher, queue)) for _ in range(concurrency)]
+        for job in thread_jobs(conn, sync=sync):
+            total_comments += len(job.comment_ids)
+            for comment_id in job.comment_ids:
+                await queue.put((job, comment_id))
+        await queue.join()
+        for worker in workers:
+            worker.cancel()
+
+        if replies:
+            # Replies are crawled thread by thread, each crawl using the full concurrency of the shared fetcher
+            for thread in hiring_threads(conn):
+                if thread["comments_fetched_at"] is not None:
+                    await crawl_replies(fetcher, conn, thread)
+    elapsed = time.perf_counter() - start_time
+    print(f"all threads: {total_comments} comments in {elapsed:.2f}s")
 
 if __name__ == "__main__":
-    # creates output/whoishiring_threads.jsonl file, containing list of threads
-    fetch_whoishiring_threads()
-    # get all the post from 
-    asyncio.run(main())
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sync", action="store_true", help="Only fetch new threads and new or changed comments")
+    parser.add_argument("--replies", action="store_true", help="Also crawl the reply tree of each thread")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--base-url", default=hn_api_url, help="HN API base url, e.g. a local fake_hn_server.py")
+    args = parser.parse_args()
+
+    # stores the list of threads of the whoishiring user
+    fetch_whoishiring_threads(sync=args.sync, base_url=args.base_url)
+    # get all the post from
+    asyncio.run(main(concurrency=args.concurrency, sync=args.sync, replies=args.replies, base_url=args.base_url))
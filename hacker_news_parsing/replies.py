@@ -0,0 +1,66 @@
+# Breadth-first crawl of the reply tree below the top-level comments of a thread
+# Replies are written to the store as they arrive and the store is the frontier: each pass reads the kids of the
+# stored comments in batches (the first pass all of them, the next ones only the replies fetched by the previous
+# pass) and fetches the kids that are not stored yet, so memory does not grow with the size of the thread.
+# The crawl is resumable: on restart, stored replies are skipped and their kids are fetched by the first pass.
+
+import asyncio
+import time
+
+from fetcher import FetchStats
+from store import comment_keys, comment_kids, record_failures, upsert_comments
+
+# Replies are committed in small batches, an interruption loses at most this many (they are simply refetched)
+COMMIT_EVERY = 100
+
+
+async def crawl_replies(fetcher, conn, thread, batch_size=500):
+    # The queue bounds how many ids wait for the workers, batch_size how many stored comments are read at once
+    frontier = asyncio.Queue(maxsize=batch_size)
+    stats = FetchStats()
+    uncommitted = 0
+
+    async def worker():
+        # An error is recorded as a failed reply, it never stops the worker (the crawl would wait for it forever)
+        nonlocal uncommitted
+        while True:
+            reply_id = await frontier.get()
+            try:
+                reply = await fetcher.fetch_item(reply_id, stats)
+                if reply is not None:
+                    upsert_comments(conn, thread["id"], thread["month"], [reply], time.time(), is_reply=True)
+                    uncommitted += 1
+                    if uncommitted >= COMMIT_EVERY:
+                        conn.commit()
+                        uncommitted = 0
+            except Exception as e:
+                print(f"Storing reply {reply_id} of {thread['month']} {thread['title']} failed: {e!r}")
+                stats.failures[reply_id] = repr(e)
+            finally:
+                frontier.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(fetcher.concurrency)]
+    fetched_since = None
+    while True:
+        start = time.time()
+        queued = 0
+        for batch in comment_kids(conn, thread["id"], fetched_since, batch_size):
+            kids = [kid for _, ids in batch for kid in ids]
+            stored = {key[0] for key in comment_keys(conn, kids)}
+            # Replies that failed in this crawl are recorded below and retried on the next run
+            for kid in kids:
+                if kid not in stored and kid not in stats.failures:
+                    queued += 1
+                    await frontier.put(kid)
+        # Every reply of the pass is stored before the next pass reads their kids
+        await frontier.join()
+        if not queued:
+            break
+        fetched_since = start
+    for task in workers:
+        task.cancel()
+
+    record_failures(conn, thread["id"], stats.failures, is_reply=True)
+    conn.commit()
+    if stats.latencies or stats.failures:
+        stats.report(f"{thread['month']} {thread['title']} (replies)")
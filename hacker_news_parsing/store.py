@@ -0,0 +1,232 @@
+# Single SQLite store for the raw Hacker News data, replacing the per-month output/<date>/<title>/ directories
+# threads: every thread submitted by whoishiring, comments: top-level comments and replies keyed by id,
+# failures: ids that could not be fetched and are retried on the next run (threads are stored with thread_id 0).
+# Comments carry the month of their thread so stages can filter on month/deleted/dead directly in SQL.
+# Only uses the standard library, so it can be imported from the LLM processing script as well.
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+STORE_PATH = "output/hn_items.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    id INTEGER PRIMARY KEY,
+    month TEXT,
+    time INTEGER,
+    title TEXT,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    dead INTEGER NOT NULL DEFAULT 0,
+    kids TEXT NOT NULL DEFAULT '[]',
+    comments_fetched_at INTEGER
+);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY,
+    thread_id INTEGER NOT NULL,
+    parent INTEGER,
+    month TEXT,
+    time INTEGER,
+    by TEXT,
+    text TEXT,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    dead INTEGER NOT NULL DEFAULT 0,
+    is_reply INTEGER NOT NULL DEFAULT 0,
+    kids TEXT NOT NULL DEFAULT '[]',
+    fetched_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS comments_month ON comments (month, deleted, dead);
+CREATE INDEX IF NOT EXISTS comments_thread ON comments (thread_id, is_reply);
+CREATE TABLE IF NOT EXISTS failures (
+    id INTEGER PRIMARY KEY,
+    thread_id INTEGER NOT NULL,
+    is_reply INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+"""
+
+# thread_id of the failed threads in the failures table
+NO_THREAD = 0
+
+COMMENT_COLUMNS = ["id", "thread_id", "parent", "month", "time", "by", "text", "deleted", "dead", "is_reply", "kids", "fetched_at"]
+
+
+def open_store(path=STORE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    # WAL lets the LLM stage read while the fetcher appends
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def month_of(timestamp):
+    return datetime.fromtimestamp(int(timestamp)).strftime("%Y-%m")
+
+
+def upsert_thread(conn, thread_data):
+    conn.execute(
+        """
+        INSERT INTO threads (id, month, time, title, deleted, dead, kids) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (id) DO UPDATE SET
+            month = excluded.month, time = excluded.time, title = excluded.title,
+            deleted = excluded.deleted, dead = excluded.dead, kids = excluded.kids
+        """,
+        (
+            thread_data["id"],
+            month_of(thread_data["time"]) if "time" in thread_data else None,
+            thread_data.get("time"),
+            thread_data.get("title", ""),
+            thread_data.get("deleted", False),
+            thread_data.get("dead", False),
+            json.dumps(thread_data.get("kids", [])),
+        ),
+    )
+    conn.execute("DELETE FROM failures WHERE id = ?", (thread_data["id"],))
+
+
+def upsert_comments(conn, thread_id, month, comments, fetched_at, is_reply=False):
+    conn.executemany(
+        f"""
+        INSERT INTO comments ({", ".join(COMMENT_COLUMNS)}) VALUES ({", ".join("?" * len(COMMENT_COLUMNS))})
+        ON CONFLICT (id) DO UPDATE SET
+            {", ".join(f"{column} = excluded.{column}" for column in COMMENT_COLUMNS[1:])}
+        """,
+        [
+            (
+                comment_data["id"],
+                thread_id,
+                comment_data.get("parent"),
+                month,
+                comment_data.get("time"),
+                comment_data.get("by"),
+                comment_data.get("text"),
+                comment_data.get("deleted", False),
+                comment_data.get("dead", False),
+                is_reply,
+                json.dumps(comment_data.get("kids", [])),
+                int(fetched_at),
+            )
+            for comment_data in comments
+        ],
+    )
+    conn.executemany("DELETE FROM failures WHERE id = ?", [(comment_data["id"],) for comment_data in comments])
+
+
+def record_failures(conn, thread_id, failures, is_reply=False):
+    conn.executemany(
+        "INSERT OR REPLACE INTO failures (id, thread_id, is_reply, error) VALUES (?, ?, ?, ?)",
+        [(item_id, thread_id, is_reply, error) for item_id, error in failures.items()],
+    )
+
+
+def failed_ids(conn, thread_id, is_reply=False):
+    rows = conn.execute("SELECT id FROM failures WHERE thread_id = ? AND is_reply = ?", (thread_id, is_reply))
+    return [row["id"] for row in rows]
+
+
+def failed_threads(conn):
+    return failed_ids(conn, NO_THREAD)
+
+
+def known_threads(conn):
+    return {row["id"]: row["time"] for row in conn.execute("SELECT id, time FROM threads")}
+
+
+def hiring_threads(conn):
+    # We only want threads that are not deleted, not dead, have kids and have "hiring" in the title
+    # (We want to avoid Who wants to be hired posts)
+    rows = conn.execute(
+        "SELECT * FROM threads WHERE NOT deleted AND NOT dead AND kids != '[]' AND lower(title) LIKE '%hiring%' ORDER BY time DESC"
+    )
+    return [dict(row, kids=json.loads(row["kids"])) for row in rows]
+
+
+def mark_comments_fetched(conn, thread_id, fetched_at):
+    conn.execute("UPDATE threads SET comments_fetched_at = ? WHERE id = ?", (int(fetched_at), thread_id))
+
+
+def comment_states(conn, thread_id):
+    # {comment_id: (time, deleted, fetched_at)} of the top-level comments of a thread
+    rows = conn.execute("SELECT id, time, deleted, fetched_at FROM comments WHERE thread_id = ? AND NOT is_reply", (thread_id,))
+    return {row["id"]: (row["time"], row["deleted"], row["fetched_at"]) for row in rows}
+
+
+def query_comments(conn, months=None, include_deleted=False, include_dead=True, include_replies=False, with_text=True):
+    # The filters are pushed down to SQLite (indexed on month, deleted, dead)
+    conditions = []
+    params = []
+    if months is not None:
+        months = list(months)
+        conditions.append(f"month IN ({', '.join('?' * len(months))})")
+        params.extend(months)
+    if not include_deleted:
+        conditions.append("NOT deleted")
+    if not include_dead:
+        conditions.append("NOT dead")
+    if not include_replies:
+        conditions.append("NOT is_reply")
+    if with_text:
+        conditions.append("text IS NOT NULL")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = conn.execute(f"SELECT * FROM comments {where} ORDER BY month, time", params)
+    return [dict(row, kids=json.loads(row["kids"])) for row in rows]
+
+
+def comment_kids(conn, thread_id, fetched_since=None, batch_size=500):
+    # Yields the [(id, kids)] of the stored comments of a thread (only those fetched since a time), batch by
+    # batch in id order, so only one batch is in memory; comments stored meanwhile with a larger id are included
+    condition, params = ("AND fetched_at >= ?", [int(fetched_since)]) if fetched_since is not None else ("", [])
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT id, kids FROM comments WHERE thread_id = ? AND id > ? {condition} ORDER BY id LIMIT ?",
+            [thread_id, last_id, *params, batch_size],
+        ).fetchall()
+        if not rows:
+            return
+        yield [(row["id"], json.loads(row["kids"])) for row in rows]
+        last_id = rows[-1]["id"]
+
+
+def comment_keys(conn, comment_ids, chunk_size=900):
+    # [(id, thread_id, time)] of the given comments, looked up by primary key in chunks
+    # (SQLite limits the number of parameters of a query)
+    comment_ids = [int(comment_id) for comment_id in comment_ids]
+    keys = []
+    for start in range(0, len(comment_ids), chunk_size):
+        chunk = comment_ids[start:start + chunk_size]
+        rows = conn.execute(f"SELECT id, thread_id, time FROM comments WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+        keys.extend((row["id"], row["thread_id"], row["time"]) for row in rows)
+    return keys
+
+
+def import_output_dir(conn, output_dir="output"):
+    # One-off import of the legacy output/<date>/<title>/ layout (thread.json, comments.jsonl, replies.jsonl)
+    for root, dirs, files in os.walk(output_dir):
+        if "thread.json" not in files:
+            continue
+        with open(os.path.join(root, "thread.json"), "r") as f:
+            thread_data = json.load(f)
+        upsert_thread(conn, thread_data)
+        month = month_of(thread_data["time"])
+        for filename, is_reply in (("comments.jsonl", False), ("replies.jsonl", True)):
+            if filename in files:
+                path = os.path.join(root, filename)
+                with open(path, "r") as f:
+                    comments = [json.loads(line) for line in f if line.strip()]
+                upsert_comments(conn, thread_data["id"], month, comments, os.path.getmtime(path), is_reply)
+                if not is_reply:
+                    mark_comments_fetched(conn, thread_data["id"], os.path.getmtime(path))
+    conn.commit()
+
+
+if __name__ == "__main__":
+    # Migrate an existing output directory into the store
+    conn = open_store()
+    import_output_dir(conn)
+    count = conn.execute("SELECT count(*) FROM comments").fetchone()[0]
+    print(f"{count} comments in {STORE_PATH}")
@@ -1 +1,4 @@
-hn_api_url = "https://hacker-news.firebaseio.com/v0"
+import os
+
+# Can be pointed at a local stand-in (see fake_hn_server.py) to test or benchmark the fetchers offline
+hn_api_url = os.environ.get("HN_API_URL", "https://hacker-news.firebaseio.com/v0")
@@ -1,34 +1,51 @@
 # User Whoishiring post a thread every month
 # Get all the threads ids from Whoishiring
-# https://hacker-news.firebaseio.com/v0/user/whoishiring.json?print=pretty
+# https://hacker-news.firebaseio.com/v0/user/whoishiring.json
+# The user and the threads are fetched with the retries of the Fetcher, threads that still fail are recorded
+# in the store and fetched again on the next run.
 
-import json
-import os
+import time
 import asyncio
-import httpx
 
+from fetcher import Fetcher, FetchStats
 from utils import hn_api_url
-
-
-async def fetch_thread(client, thread_id):
-    response = await client.get(f"{hn_api_url}/item/{thread_id}.json?print=pretty")
-    return response.json()
-
-
-async def fetch_all_threads(thread_ids):
-    async with httpx.AsyncClient(timeout=30) as client:
-        tasks = [fetch_thread(client, thread_id) for thread_id in thread_ids]
-        return await asyncio.gather(*tasks)
-
-def fetch_whoishiring_threads():
-    whoishiring = httpx.get(f"{hn_api_url}/user/whoishiring.json?print=pretty")
-    whoishiring_data = whoishiring.json()
-    threads_ids = whoishiring_data["submitted"]
-
-    thread_data_list = asyncio.run(fetch_all_threads(threads_ids))
-
-    os.makedirs("output", exist_ok=True)
-
-    with open("output/whoishiring_threads.jsonl", "w") as f:
-        for thread_data in thread_data_list:
-            f.write(json.dumps(thread_data) + "\n")
+from store import NO_THREAD, failed_threads, known_threads, open_store, record_failures, upsert_thread
+
+
+# Threads younger than this are still receiving comments and are refreshed on every sync
+LIVE_THREAD_AGE = 35 * 24 * 60 * 60
+
+
+async def fetch_threads(sync, base_url, conn):
+    async with Fetcher(base_url=base_url) as fetcher:
+        stats = FetchStats()
+        whoishiring_data = await fetcher.fetch("user/whoishiring.json", "whoishiring", stats)
+        if whoishiring_data is None:
+            raise ValueError(f"Could not fetch the whoishiring user: {stats.failures['whoishiring']}")
+        threads_ids = whoishiring_data["submitted"]
+
+        known = known_threads(conn) if sync else {}
+        if known:
+            # Only fetch threads we have never seen, plus the live ones whose kids are still growing
+            now = time.time()
+            threads_ids = [
+                thread_id for thread_id in threads_ids
+                if thread_id not in known or now - (known[thread_id] or 0) < LIVE_THREAD_AGE
+            ]
+        # Threads that failed on the previous run
+        queued = set(threads_ids)
+        threads_ids += [thread_id for thread_id in failed_threads(conn) if thread_id not in queued]
+        if known:
+            print(f"Sync: fetching {len(threads_ids)} new, live or failed threads")
+
+        thread_data_list, failures = await fetcher.fetch_items(threads_ids, label="threads")
+    for thread_data in thread_data_list:
+        if thread_data is not None:
+            upsert_thread(conn, thread_data)
+    record_failures(conn, NO_THREAD, failures)
+    conn.commit()
+
+
+def fetch_whoishiring_threads(sync=False, base_url=hn_api_url, conn=None):
+    conn = conn or open_store()
+    asyncio.run(fetch_threads(sync, base_url, conn))
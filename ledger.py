@@ -0,0 +1,136 @@
+# Durable ledger of the Exxa requests, keyed by comment_id (the value sent in the request metadata)
+# pending: about to be sent, submitted: accepted by the API (request_id known), done: result collected,
+# failed: the API refused it or the retries were exhausted (submitted again on the next run),
+# duplicate: same content as an already submitted comment (duplicate_of), never sent (see dedup.py).
+# A comment that is submitted or done is never sent again, so a crashed run can simply be restarted.
+
+import sqlite3
+import time
+
+LEDGER_PATH = "exxa_ledger.sqlite"
+
+PENDING = "pending"
+SUBMITTED = "submitted"
+DONE = "done"
+FAILED = "failed"
+DUPLICATE = "duplicate"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    comment_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    request_id TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at INTEGER,
+    time INTEGER,
+    content_hash TEXT,
+    simhash TEXT,
+    duplicate_of TEXT
+);
+CREATE INDEX IF NOT EXISTS requests_state ON requests (state);
+"""
+
+# Columns added after the first version of the ledger, added to older ledgers when they are opened
+ADDED_COLUMNS = {"time": "INTEGER", "content_hash": "TEXT", "simhash": "TEXT", "duplicate_of": "TEXT"}
+
+
+def open_ledger(path=LEDGER_PATH):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(requests)")}
+    for column, column_type in ADDED_COLUMNS.items():
+        if column not in columns:
+            conn.execute(f"ALTER TABLE requests ADD COLUMN {column} {column_type}")
+    return conn
+
+
+def states(conn):
+    return {row["comment_id"]: row["state"] for row in conn.execute("SELECT comment_id, state FROM requests")}
+
+
+def to_submit(conn, comment_ids):
+    # Comments never sent, or whose last attempt failed or was interrupted before the API answered,
+    # or duplicates of a comment that could not be submitted
+    known = states(conn)
+    orphans = {
+        row["comment_id"]
+        for row in conn.execute(
+            """
+            SELECT duplicate.comment_id FROM requests AS duplicate
+            LEFT JOIN requests AS canonical ON canonical.comment_id = duplicate.duplicate_of
+            WHERE duplicate.state = ? AND (canonical.state IS NULL OR canonical.state NOT IN (?, ?))
+            """,
+            (DUPLICATE, SUBMITTED, DONE),
+        )
+    }
+    return [
+        comment_id for comment_id in comment_ids
+        if known.get(str(comment_id)) not in (SUBMITTED, DONE, DUPLICATE) or str(comment_id) in orphans
+    ]
+
+
+def mark_pending(conn, comment_id, comment_time=None, content_hash=None, simhash=None):
+    conn.execute(
+        """
+        INSERT INTO requests (comment_id, state, attempts, updated_at, time, content_hash, simhash) VALUES (?, ?, 1, ?, ?, ?, ?)
+        ON CONFLICT (comment_id) DO UPDATE SET
+            state = excluded.state, attempts = attempts + 1, updated_at = excluded.updated_at, time = excluded.time,
+            content_hash = excluded.content_hash, simhash = excluded.simhash, duplicate_of = NULL
+        """,
+        (str(comment_id), PENDING, int(time.time()), comment_time, content_hash, simhash),
+    )
+    conn.commit()
+
+
+def mark_duplicates(conn, duplicates):
+    # duplicates: list of (comment_id, duplicate_of, comment_time, content_hash, simhash)
+    now = int(time.time())
+    conn.executemany(
+        """
+        INSERT INTO requests (comment_id, state, updated_at, duplicate_of, time, content_hash, simhash) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (comment_id) DO UPDATE SET
+            state = excluded.state, updated_at = excluded.updated_at, duplicate_of = excluded.duplicate_of,
+            time = excluded.time, content_hash = excluded.content_hash, simhash = excluded.simhash
+        """,
+        [(str(comment_id), DUPLICATE, now, str(duplicate_of), comment_time, text_hash, text_simhash)
+         for comment_id, duplicate_of, comment_time, text_hash, text_simhash in duplicates],
+    )
+    conn.commit()
+
+
+def canonical_fingerprints(conn):
+    # Content hashes and SimHashes of the comments actually sent to the API
+    rows = conn.execute(
+        "SELECT comment_id, content_hash, simhash FROM requests WHERE state IN (?, ?) AND content_hash IS NOT NULL",
+        (SUBMITTED, DONE),
+    ).fetchall()
+    hashes = {row["content_hash"]: row["comment_id"] for row in rows}
+    simhashes = [(int(row["simhash"], 16), row["comment_id"]) for row in rows if row["simhash"] is not None]
+    return hashes, simhashes
+
+
+def duplicates(conn):
+    # [(comment_id, duplicate_of, time)] of the comments reusing the extraction of another one
+    rows = conn.execute("SELECT comment_id, duplicate_of, time FROM requests WHERE state = ?", (DUPLICATE,))
+    return [(row["comment_id"], row["duplicate_of"], row["time"]) for row in rows]
+
+
+def mark(conn, comment_id, state, request_id=None, error=None):
+    conn.execute(
+        "UPDATE requests SET state = ?, request_id = coalesce(?, request_id), error = ?, updated_at = ? WHERE comment_id = ?",
+        (state, request_id, error, int(time.time()), str(comment_id)),
+    )
+    conn.commit()
+
+
+def request_ids(conn, state=SUBMITTED):
+    rows = conn.execute("SELECT comment_id, request_id FROM requests WHERE state = ?", (state,))
+    return {row["comment_id"]: row["request_id"] for row in rows}
+
+
+def summary(conn):
+    return dict(conn.execute("SELECT state, count(*) FROM requests GROUP BY state").fetchall())
@@ -0,0 +1,234 @@
+# Batch parsing of the LLM extractions into typed columns
+# Every output is decoded once (truncated outputs get a cheap repair first), the whole batch is validated
+# against HNJobPosting with one TypeAdapter call, and the fields that fail validation are dropped (the model
+# default is used) or, for lists, only the invalid items are. The result is one column per field: lists stay
+# lists, enums become categoricals with the categories of model.py, numbers are floats.
+# The columns are stored as a typed Parquet dataset (list<string>, dictionary, double), read back with only
+# the columns an analysis needs.
+
+import typing
+from collections import Counter
+from enum import Enum
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pydantic import TypeAdapter, ValidationError
+
+from model import HNJobPosting
+
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+DATASET_PATH = "HN_case_study_expanded.parquet"
+
+POSTINGS_ADAPTER = TypeAdapter(typing.List[HNJobPosting])
+
+FIELDS = list(HNJobPosting.model_fields)
+# {field: enum} for the enum fields, whether the field is a list of enums or a single one
+ENUM_FIELDS = {}
+LIST_FIELDS = set()
+for name, field in HNJobPosting.model_fields.items():
+    annotation = field.annotation
+    if typing.get_origin(annotation) in (list, typing.List):
+        LIST_FIELDS.add(name)
+        annotation = typing.get_args(annotation)[0]
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        ENUM_FIELDS[name] = annotation
+
+
+def repair_json(content):
+    # Outputs cut by max_tokens end in the middle of a string, a key or a list: the open string is closed,
+    # a dangling key or separator is dropped and the open brackets are closed, in the order they were opened
+    content = content.strip()
+    if not content.startswith("{"):
+        content = "{" + content if content.startswith('"') else '{"' + content
+    closing = []
+    in_string = False
+    escaped = False
+    string_start = 0
+    for position, char in enumerate(content):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+            string_start = position
+        elif char in "{[":
+            closing.append("}" if char == "{" else "]")
+        elif char in "}]" and closing:
+            closing.pop()
+    if escaped:
+        content = content[:-1]
+    if in_string:
+        content += '"'
+    content = content.rstrip()
+    if content.endswith(":"):
+        content = content[:-1].rstrip()
+    # A key without its value: {"a": 1, "b"
+    if closing and closing[-1] == "}" and content.endswith('"') and content[:string_start].rstrip().endswith((",", "{")):
+        content = content[:string_start].rstrip()
+    if content.endswith(","):
+        content = content[:-1]
+    return content + "".join(reversed(closing))
+
+
+def drop_invalid(data, errors):
+    # Removes what failed validation: the invalid items of a list, the whole field otherwise
+    data = dict(data)
+    items = {}
+    for loc in errors:
+        if len(loc) > 1 and isinstance(loc[1], int) and isinstance(data.get(loc[0]), list):
+            items.setdefault(loc[0], set()).add(loc[1])
+        else:
+            data.pop(loc[0], None)
+    for name, indexes in items.items():
+        if name in data:
+            data[name] = [item for index, item in enumerate(data[name]) if index not in indexes]
+    return data
+
+
+def validate(documents, stats):
+    # One validation of the whole batch, the documents with errors are cleaned and validated once more.
+    # Returns the postings, None where the document could not be validated even without its invalid fields
+    try:
+        return POSTINGS_ADAPTER.validate_python(documents)
+    except ValidationError as e:
+        errors = {}
+        for error in e.errors():
+            index, *loc = error["loc"]
+            if loc:
+                errors.setdefault(index, []).append(tuple(loc))
+                stats.field_failures[loc[0]] += 1
+            else:
+                errors.setdefault(index, [])
+
+    postings = [None] * len(documents)
+    valid_indexes = [index for index in range(len(documents)) if index not in errors]
+    for index, posting in zip(valid_indexes, POSTINGS_ADAPTER.validate_python([documents[index] for index in valid_indexes])):
+        postings[index] = posting
+    repaired_indexes = list(errors)
+    repaired = [drop_invalid(documents[index], errors[index]) for index in repaired_indexes]
+    try:
+        for index, posting in zip(repaired_indexes, POSTINGS_ADAPTER.validate_python(repaired)):
+            postings[index] = posting
+            stats.cleaned += 1
+    except ValidationError:
+        # Rare (a required field is missing), validated one by one to keep the others
+        for index, document in zip(repaired_indexes, repaired):
+            try:
+                postings[index] = HNJobPosting.model_validate(document)
+                stats.cleaned += 1
+            except ValidationError:
+                stats.invalid += 1
+    return postings
+
+
+class ParseStats:
+    def __init__(self):
+        self.total = 0
+        self.repaired = 0
+        self.undecodable = 0
+        self.cleaned = 0
+        self.invalid = 0
+        self.field_failures = Counter()
+
+    def report(self):
+        print(f"Parsed {self.total} extractions: {self.repaired} repaired json, {self.undecodable} not json, "
+              f"{self.cleaned} with invalid fields dropped, {self.invalid} invalid")
+        for name, count in self.field_failures.most_common():
+            print(f"  {name}: {count} validation failures")
+
+
+def to_columns(postings, index=None):
+    # {field: column} of the postings, rows without a posting are missing values (None for the list fields)
+    columns = {}
+    for name in FIELDS:
+        values = [getattr(posting, name) if posting is not None else None for posting in postings]
+        if name in ENUM_FIELDS:
+            enum = ENUM_FIELDS[name]
+            categories = [member.value for member in enum]
+            if name in LIST_FIELDS:
+                columns[name] = pd.Series([[item.value for item in value] if value is not None else None for value in values], index=index, dtype=object)
+            else:
+                columns[name] = pd.Series(pd.Categorical([value.value if value is not None else None for value in values], categories=categories), index=index)
+        elif name in LIST_FIELDS:
+            columns[name] = pd.Series(values, index=index, dtype=object)
+        elif name in ("compensation_min", "compensation_max", "fundraising_amount"):
+            columns[name] = pd.Series(values, index=index, dtype="float64")
+        elif name == "visa_sponsoring":
+            columns[name] = pd.Series(values, index=index, dtype="boolean")
+        else:
+            columns[name] = pd.Series(values, index=index, dtype=object)
+    return pd.DataFrame(columns, index=index)
+
+
+def parse_postings(contents, stats=None):
+    # contents: Series of raw LLM outputs, returns a DataFrame with the same index and one column per field
+    stats = stats if stats is not None else ParseStats()
+    documents = []
+    positions = []
+    for position, content in enumerate(contents):
+        stats.total += 1
+        data = None
+        if isinstance(content, str):
+            try:
+                data = loads(content)
+            except ValueError:
+                try:
+                    data = loads(repair_json(content))
+                    stats.repaired += 1
+                except ValueError:
+                    pass
+        if isinstance(data, dict):
+            documents.append(data)
+            positions.append(position)
+        else:
+            stats.undecodable += 1
+
+    postings = [None] * len(contents)
+    for position, posting in zip(positions, validate(documents, stats)):
+        postings[position] = posting
+    return to_columns(postings, index=contents.index)
+
+
+# Columns written next to the extracted fields
+KEY_SCHEMA = [
+    ("year", pa.int64()), ("month", pa.int64()), ("comment_id", pa.int64()), ("thread_id", pa.int64()),
+    ("time", pa.int64()), ("metadata", pa.string()),
+]
+
+
+def field_type(name):
+    if name in LIST_FIELDS:
+        return pa.list_(pa.string())
+    if name in ENUM_FIELDS:
+        return pa.dictionary(pa.int8(), pa.string())
+    if name in ("compensation_min", "compensation_max", "fundraising_amount"):
+        return pa.float64()
+    if name == "visa_sponsoring":
+        return pa.bool_()
+    return pa.string()
+
+
+DATASET_SCHEMA = pa.schema(KEY_SCHEMA + [(name, field_type(name)) for name in FIELDS])
+
+
+def write_postings(df, path=DATASET_PATH):
+    table = pa.Table.from_pandas(df[DATASET_SCHEMA.names], schema=DATASET_SCHEMA, preserve_index=False)
+    pq.write_table(table, path)
+
+
+def read_postings(path=DATASET_PATH, columns=None, filters=None):
+    # Only the requested columns (and the rows matching the pyarrow filters) are read from the file, list
+    # columns come back as python lists (empty for the rows that could not be parsed)
+    df = pd.read_parquet(path, columns=columns, filters=filters)
+    for name in LIST_FIELDS.intersection(df.columns):
+        df[name] = [list(values) if values is not None else [] for values in df[name]]
+    return df
@@ -0,0 +1,101 @@
+# Prompt building for the extraction requests
+# The schema is minified once (no titles, no whitespace) instead of being pasted verbatim in every request,
+# the HN comment HTML is turned into plain text, and pathological posts are truncated.
+
+import html
+import json
+import re
+
+from model import HNJobPosting
+
+# Longest post sent to the LLM, a few real posts are pasted résumés or whole job descriptions
+MAX_POST_CHARS = 6000
+# Rough size of a llama token for English text, only used to report the savings
+CHARS_PER_TOKEN = 4
+
+PARAGRAPH_RE = re.compile(r"<p>|<br\s*/?>", re.IGNORECASE)
+LINK_RE = re.compile(r'<a\s[^>]*href="([^"]*)"[^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL)
+TAG_RE = re.compile(r"<[^>]+>")
+BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+SPACES_RE = re.compile(r"[ \t]+")
+
+
+def compact_schema(schema, in_mapping=False):
+    # Drops the "title" pydantic adds to every object and property (the property names already say it all),
+    # keys of "properties"/"$defs" are names, not schema keywords, so they are kept as they are
+    if isinstance(schema, dict):
+        return {
+            key: compact_schema(value, in_mapping=key in ("properties", "$defs") and not in_mapping)
+            for key, value in schema.items()
+            if in_mapping or key != "title"
+        }
+    if isinstance(schema, list):
+        return [compact_schema(value) for value in schema]
+    return schema
+
+
+SCHEMA_JSON = json.dumps(compact_schema(HNJobPosting.model_json_schema()), separators=(",", ":"))
+
+SYSTEM_PROMPT = (
+    "You are an helpful assistant, you will fill a json object from a Who's Hiring hackernews post. "
+    f"You will use the following json schema to answer: {SCHEMA_JSON}"
+)
+
+# What the requests used to contain, kept to report how much is saved
+LEGACY_SYSTEM_PROMPT = (
+    "You are an helpful assistant, you will fill a json object from a Who's Hiring hackernews post. "
+    f"You will use the following json schema to answer: {HNJobPosting.model_json_schema()}"
+)
+LEGACY_RESPONSE_SCHEMA = json.dumps(HNJobPosting.model_json_schema())
+
+
+def html_to_text(text):
+    text = PARAGRAPH_RE.sub("\n", text)
+    # Keep the link target when the anchor text is a shortened url
+    text = LINK_RE.sub(lambda match: match.group(1) if match.group(2).endswith("...") else match.group(2), text)
+    text = html.unescape(TAG_RE.sub("", text))
+    text = SPACES_RE.sub(" ", text)
+    return BLANK_LINES_RE.sub("\n", text).strip()
+
+
+def truncate(text, max_chars=MAX_POST_CHARS):
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + " [...]"
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN
+
+
+class PromptStats:
+    def __init__(self):
+        self.requests = 0
+        self.tokens = 0
+        self.legacy_tokens = 0
+        self.truncated = 0
+
+    def report(self):
+        if self.requests == 0:
+            return
+        saved = self.legacy_tokens - self.tokens
+        print(
+            f"Prompts: {self.requests} requests, ~{self.tokens / self.requests:.0f} input tokens per request "
+            f"(~{saved / self.requests:.0f} saved per request, {saved / max(1, self.legacy_tokens):.0%} of the legacy prompt), "
+            f"{self.truncated} posts truncated"
+        )
+
+
+def build_messages(post_html, prefix="", stats=None):
+    post = html_to_text(post_html)
+    post_truncated = truncate(post)
+    user_content = "Parse the following post to json: " + prefix + post_truncated
+    if stats is not None:
+        stats.requests += 1
+        stats.truncated += post_truncated is not post
+        stats.tokens += estimate_tokens(SYSTEM_PROMPT + user_content + SCHEMA_JSON)
+        stats.legacy_tokens += estimate_tokens(LEGACY_SYSTEM_PROMPT + "Parse the following post to json: " + prefix + post_html + LEGACY_RESPONSE_SCHEMA)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_content},
+    ]
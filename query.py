@@ -0,0 +1,190 @@
+# Ad-hoc queries over the processed postings
+# The postings are read once from the dataset, sorted by month, and every filterable field (normalized tech,
+# country, city, continent, seniority, remote, company, comment status, visa) gets an inverted index: each
+# value maps to the sorted positions of the postings that have it. A query takes the union of the positions
+# of the values of a field, intersects the fields, and cuts the result to a time range with a binary search
+# (the positions follow the months), so counts, shares and series only touch the matching postings.
+#
+#   python query.py --tech rust --continent Europe --visa true --since 2020 --share remote=Remote --series year
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from postings import DATASET_PATH, LIST_FIELDS, read_postings
+from tech_normalization import normalize_tech, normalize_techs
+
+# {query field: dataset column}
+INDEXED_FIELDS = {
+    'tech': 'tech_stack',
+    'country': 'countries',
+    'city': 'cities',
+    'continent': 'continents',
+    'seniority': 'seniority_level',
+    'remote': 'remote',
+    'company': 'hiring_company',
+    'status': 'comment_status',
+    'visa': 'visa_sponsoring',
+}
+PERIODS = ('year', 'year_month')
+
+EMPTY = np.array([], dtype=np.int64)
+
+
+def index_key(field, value):
+    # Keys are compared case-insensitively, techs are normalized and GB is UK, as in the analyses
+    if field == 'tech':
+        return normalize_tech(str(value))
+    key = str(value).strip().lower()
+    return 'uk' if field == 'country' and key == 'gb' else key
+
+
+def index_keys(field, values):
+    # index_key of a Series of values, computed once per distinct value
+    if field == 'tech':
+        values = values[values.str.strip() != '']
+        return normalize_techs(values).astype(object)
+    keys = values.astype(str).str.strip().str.lower()
+    return keys.replace('gb', 'uk') if field == 'country' else keys
+
+
+def inverted_index(keys):
+    # {key: sorted unique positions}, keys is indexed by the position of the posting (repeated for list fields)
+    keys = keys[keys != '']
+    if keys.empty:
+        return {}
+    codes, uniques = pd.factorize(keys)
+    positions = keys.index.to_numpy(dtype=np.int64)
+    order = np.lexsort((positions, codes))
+    codes, positions = codes[order], positions[order]
+    # A value listed twice in the same posting is indexed once
+    unique = np.r_[True, (np.diff(codes) != 0) | (np.diff(positions) != 0)]
+    codes, positions = codes[unique], positions[unique]
+    starts = np.r_[0, np.flatnonzero(np.diff(codes)) + 1]
+    return dict(zip(uniques[codes[starts]], np.split(positions, starts[1:])))
+
+
+def month_number(value, end=False):
+    # '2020' -> 202001 (202012 for the end of a range), '2020-03' -> 202003
+    year, _, month = str(value).partition('-')
+    return int(year) * 100 + (int(month) if month else (12 if end else 1))
+
+
+class PostingIndex:
+    def __init__(self, df):
+        # df: postings with year, month and the INDEXED_FIELDS columns
+        df = df.dropna(subset=['year', 'month'])
+        df = df.assign(period=df['year'].astype('int64') * 100 + df['month'].astype('int64'))
+        df = df.sort_values('period', kind='stable').reset_index(drop=True)
+        self.periods = df['period'].to_numpy()
+        # Month of each posting, as a code into the sorted months
+        months, self.month_codes = np.unique(self.periods, return_inverse=True)
+        self.labels = {
+            'year_month': pd.Index([f"{month // 100}-{month % 100:02d}" for month in months], name='year_month'),
+            'year': pd.Index(months // 100, name='year'),
+        }
+        self.indexes = {}
+        for field, column in INDEXED_FIELDS.items():
+            values = df[column].explode() if column in LIST_FIELDS else df[column]
+            self.indexes[field] = inverted_index(index_keys(field, values.dropna()))
+
+    @classmethod
+    def from_dataset(cls, dataset_path=DATASET_PATH):
+        return cls(read_postings(dataset_path, columns=['year', 'month'] + list(INDEXED_FIELDS.values())))
+
+    def __len__(self):
+        return len(self.periods)
+
+    def values(self, field):
+        # Number of postings of each value of a field, most frequent first
+        return pd.Series({key: len(positions) for key, positions in self.indexes[field].items()}, dtype='int64').sort_values(ascending=False)
+
+    def positions(self, since=None, until=None, **filters):
+        # Sorted positions of the postings published between since and until ('2020', '2020-03', included)
+        # having, for every field of filters, one of its values (a value or a list of values)
+        start = np.searchsorted(self.periods, month_number(since), 'left') if since is not None else 0
+        stop = np.searchsorted(self.periods, month_number(until, end=True), 'right') if until is not None else len(self.periods)
+        result = None
+        for field, values in filters.items():
+            if values is None:
+                continue
+            if field not in self.indexes:
+                raise ValueError(f"Unknown field {field}, expected one of {', '.join(INDEXED_FIELDS)}")
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            matches = [self.indexes[field].get(index_key(field, value), EMPTY) for value in values]
+            matches = matches[0] if len(matches) == 1 else np.unique(np.concatenate(matches))
+            matches = matches[np.searchsorted(matches, start):np.searchsorted(matches, stop)]
+            result = matches if result is None else np.intersect1d(result, matches, assume_unique=True)
+        return result if result is not None else np.arange(start, stop)
+
+    def count(self, **filters):
+        return len(self.positions(**filters))
+
+    def share(self, within=None, **filters):
+        # Share of the postings matching within (a dict of filters, all the postings by default) that also
+        # match filters, NaN when none match within
+        within = within or {}
+        base = self.positions(**within)
+        matches = np.intersect1d(base, self.positions(**filters), assume_unique=True)
+        return len(matches) / len(base) if len(base) else float('nan')
+
+    def series(self, period='year_month', within=None, **filters):
+        # Number of matching postings per period, or with within their share of the postings matching within
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period {period}, expected one of {', '.join(PERIODS)}")
+        if within is None:
+            return self._period_counts(self.positions(**filters), period)
+        # As in share, filters narrow within down, also on the same field
+        base = self.positions(**within)
+        counts = self._period_counts(np.intersect1d(base, self.positions(**filters), assume_unique=True), period)
+        base = self._period_counts(base, period)
+        return (counts / base.where(base > 0)).rename('share')
+
+    def _period_counts(self, positions, period):
+        counts = pd.Series(np.bincount(self.month_codes[positions], minlength=len(self.labels['year_month'])),
+                           index=self.labels[period], name='count')
+        return counts.groupby(level=0).sum() if period == 'year' else counts
+
+
+def parse_condition(condition):
+    # 'remote=Remote' -> ('remote', 'Remote')
+    field, separator, value = condition.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError(f"expected FIELD=VALUE, got {condition}")
+    return field, value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count the postings matching filters (any of the values of a field, all the fields)")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    for field in INDEXED_FIELDS:
+        parser.add_argument(f"--{field}", nargs="+", metavar="VALUE")
+    parser.add_argument("--since", help="first month included, e.g. 2020 or 2020-03")
+    parser.add_argument("--until", help="last month included, e.g. 2024 or 2024-08")
+    parser.add_argument("--share", nargs="+", type=parse_condition, metavar="FIELD=VALUE",
+                        help="also print the share of the matching postings with these values")
+    parser.add_argument("--series", choices=PERIODS, help="print the counts (or shares) per period")
+    parser.add_argument("--values", choices=list(INDEXED_FIELDS), help="print the most frequent values of a field")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = PostingIndex.from_dataset(args.dataset)
+    print(f"Indexed {len(index)} postings in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    if args.values:
+        print(index.values(args.values).head(30).to_string())
+    within = {field: getattr(args, field) for field in INDEXED_FIELDS if getattr(args, field)}
+    within.update(since=args.since, until=args.until)
+    shared = {}
+    for field, value in args.share or []:
+        shared.setdefault(field, []).append(value)
+    print(f"Matching postings: {index.count(**within)}")
+    if shared:
+        print(f"Share with {', '.join(f'{field}={value}' for field, value in args.share)}: {index.share(within, **shared):.4f}")
+    if args.series:
+        series = index.series(args.series, within, **shared) if shared else index.series(args.series, **within)
+        print(series.to_string())
+    print(f"Query answered in {(time.perf_counter() - start) * 1000:.1f} ms")
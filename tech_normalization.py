@@ -0,0 +1,71 @@
+# Normalization of the technology names extracted by the LLM
+# The alias table (tech_aliases.json, {canonical name: [aliases]}) is loaded once. A name is lowercased and
+# looked up in the table; names with a version suffix ("angular 11", "postgresql 15", "vue3") are looked up
+# again without it. Columns are normalized once per unique name and the result broadcast with the codes.
+
+import json
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+ALIASES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tech_aliases.json")
+
+# "11", "2+", "1.x", "3.5", "v2", optionally separated from the name by a space or a dash
+VERSION_SUFFIX_RE = re.compile(r"^(?P<name>.*?[a-z+#.])[\s-]*v?\d+(?:\.(?:\d+|x))*\+?$")
+
+
+def load_aliases(path=ALIASES_PATH):
+    # {alias: canonical name}, canonical names map to themselves
+    with open(path, "r") as f:
+        table = json.load(f)
+    aliases = {}
+    for canonical, names in table.items():
+        aliases[canonical] = canonical
+        for name in names:
+            aliases[name.lower()] = canonical
+    return aliases
+
+
+class TechNormalizer:
+    def __init__(self, aliases):
+        self.aliases = aliases
+        self.normalize = lru_cache(maxsize=None)(self._normalize)
+
+    @classmethod
+    def from_file(cls, path=ALIASES_PATH):
+        return cls(load_aliases(path))
+
+    def _normalize(self, tech):
+        tech = tech.lower().strip()
+        if tech in self.aliases:
+            return self.aliases[tech]
+        match = VERSION_SUFFIX_RE.match(tech)
+        if match:
+            name = match.group("name").strip()
+            if name in self.aliases:
+                return self.aliases[name]
+        return tech
+
+    def normalize_series(self, techs, normalize=None):
+        # techs: Series of names without missing values. Returns a categorical Series with the same index
+        normalize = normalize or self.normalize
+        if techs.empty:
+            return techs.astype("category")
+        codes, uniques = pd.factorize(techs)
+        normalized = np.array([normalize(tech) for tech in uniques], dtype=object)
+        categories, inverse = np.unique(normalized, return_inverse=True)
+        return pd.Series(pd.Categorical.from_codes(inverse[codes], categories), index=techs.index)
+
+
+NORMALIZER = TechNormalizer.from_file()
+
+
+def normalize_tech(tech):
+    return NORMALIZER.normalize(tech)
+
+
+def normalize_techs(techs, normalize_func=None):
+    return NORMALIZER.normalize_series(techs, normalize_func)